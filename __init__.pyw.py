@@ -1,15 +1,53 @@
 import sys
 import os
+import re
+import shutil
+import argparse
 import json
-import io
-import numpy as np
+import contextlib
+import hashlib
+import importlib
+import multiprocessing
+import sqlite3
+import string
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QTabWidget, QPushButton, QLineEdit, QLabel, QSlider,
-                             QAction, QFileDialog, QMessageBox, QScrollArea, QShortcut)
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QFont
-from PyQt5.QtCore import Qt, QRect, QTimer
-import fitz  # PyMuPDF
-from PIL import Image
+                             QAction, QFileDialog, QMessageBox, QScrollArea, QShortcut,
+                             QAbstractScrollArea, QListWidget, QListWidgetItem, QListView,
+                             QDialog, QFormLayout, QSpinBox, QComboBox, QProgressBar, QInputDialog)
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QFont, QColor, QIcon, QDesktopServices
+from PyQt5.QtCore import (Qt, QRect, QRectF, QSize, QPoint, QTimer, QElapsedTimer, QObject, QUrl,
+                          QFileSystemWatcher, pyqtSignal)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+class LazyModule:
+    # Stands in for a module that is slow to import until something actually uses it
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.name)
+        if globals().get(self.name) is self:
+            globals()[self.name] = module  # later lookups in this file skip the proxy
+        return getattr(module, attr)
+
+fitz = LazyModule("fitz")  # PyMuPDF, about half of the import time of this file
+numpy = LazyModule("numpy")  # only the 1-bit render mode needs it
+
+# Set by benchmarks/startup.py to the launch time; the app then reports its startup milestones and quits
+STARTUP_BENCHMARK = os.environ.get("PDFREADER_STARTUP_BENCHMARK")
+startup_marks = {}
+
+def startup_mark(name):
+    if STARTUP_BENCHMARK and name not in startup_marks:
+        startup_marks[name] = (time.time() - float(STARTUP_BENCHMARK)) * 1000
 
 colors = {
     "primary": "#708090",
@@ -102,41 +140,973 @@ STYLESHEET = f"""
     }}
 """
 
+def qimage_compatible(pix):
+    # QImage only understands gray, RGB and premultiplied RGBA; convert anything else once here
+    colorants = pix.n - pix.alpha
+    if colorants not in (1, 3) or (colorants == 1 and pix.alpha):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+def samples_to_qimage(samples, width, height, stride, n, alpha, bits=8):
+    if bits == 1:
+        fmt = QImage.Format_Mono
+    elif alpha:
+        fmt = QImage.Format_RGBA8888_Premultiplied  # MuPDF samples are premultiplied
+    elif n == 1:
+        fmt = QImage.Format_Grayscale8
+    else:
+        fmt = QImage.Format_RGB888
+    # Wrap the sample buffer directly (no PNG encode/decode, no extra copy).
+    # QImage does not own this memory, so the buffer has to live as long as the image.
+    qimage = QImage(samples, width, height, stride, fmt)
+    if bits == 1:
+        qimage.setColorTable([0xFFFFFFFF, 0xFF000000])
+    qimage.samples = samples
+    return qimage
+
+def pixmap_to_qimage(pix):
+    pix = qimage_compatible(pix)
+    qimage = samples_to_qimage(pix.samples_mv, pix.width, pix.height, pix.stride, pix.n, pix.alpha)
+    qimage.pix = pix
+    return qimage
+
+# Render worker processes. PyMuPDF keeps the GIL while rasterizing, so a thread
+# pool would still freeze the GUI; every worker keeps its own document handles.
+RENDER_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+WORKER_MAX_DOCS = 8
+WORKER_MAX_DISPLAY_LISTS = 32
+worker_docs = OrderedDict()
+worker_display_lists = OrderedDict()  # (path, page) -> fitz.DisplayList
+
+def worker_init(parent_pid):
+    # Pool workers do not notice when the GUI process dies; leave instead of lingering
+    def watch_parent():
+        while True:
+            time.sleep(2)
+            if os.getppid() != parent_pid:
+                os._exit(0)
+    threading.Thread(target=watch_parent, daemon=True).start()
+
+def worker_pool(workers):
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=worker_init, initargs=(os.getpid(),))
+
+def worker_forget(path):
+    for key in [key for key in worker_display_lists if key[0] == path]:
+        del worker_display_lists[key]
+    doc, _ = worker_docs.pop(path, (None, None))
+    if doc is not None:
+        doc.close()
+
+def file_version(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def worker_document(path):
+    # Reopened when the file on disk changed since it was opened here
+    version = file_version(path)
+    doc, opened_version = worker_docs.get(path, (None, None))
+    if doc is not None and opened_version != version:
+        worker_forget(path)
+        doc = None
+    worker_docs.pop(path, None)
+    if doc is None:
+        doc = open_document(path)
+    worker_docs[path] = (doc, version)
+    while len(worker_docs) > WORKER_MAX_DOCS:
+        worker_forget(next(iter(worker_docs)))
+    return doc
+
+def worker_display_list(path, page_num):
+    # The page content stream is interpreted once; zoom changes and tiles replay the display list
+    doc = worker_document(path)  # drops the display lists of a file that changed
+    key = (path, page_num)
+    display_list = worker_display_lists.pop(key, None)
+    if display_list is None:
+        display_list = doc.load_page(page_num).get_displaylist()
+    worker_display_lists[key] = display_list
+    while len(worker_display_lists) > WORKER_MAX_DISPLAY_LISTS:
+        worker_display_lists.popitem(last=False)
+    return display_list
+
+# Pages whose raster would exceed this many pixels are rendered as tiles,
+# and only the tiles around the viewport are rasterized
+TILE_SIZE = 512
+TILED_MIN_PIXELS = 4096 * 4096
+TILE_MARGIN = TILE_SIZE
+
+def tile_clip(page_rect, matrix, tile):
+    # Page-space clip rectangle of one tile of the raster produced by `matrix`
+    bbox = page_rect * matrix
+    col, row = tile
+    x0 = bbox.x0 + col * TILE_SIZE
+    y0 = bbox.y0 + row * TILE_SIZE
+    return fitz.Rect(x0, y0, min(x0 + TILE_SIZE, bbox.x1), min(y0 + TILE_SIZE, bbox.y1)) * ~matrix
+
+def visible_tiles(width, height, rect):
+    cols = range(max(0, rect.left() // TILE_SIZE), min((width - 1) // TILE_SIZE, rect.right() // TILE_SIZE) + 1)
+    rows = range(max(0, rect.top() // TILE_SIZE), min((height - 1) // TILE_SIZE, rect.bottom() // TILE_SIZE) + 1)
+    return [(col, row) for row in rows for col in cols]
+
+# Reduced-depth modes for scans: gray is a third of the RGB raster, mono (1 bit per pixel) a 24th.
+# That holds for the render cache and the worker results; what is on screen is a 32-bit QPixmap in every mode
+RENDER_MODES = {"color": "Color", "gray": "Grayscale", "mono": "Black and White"}
+MONO_THRESHOLD = 160
+
+def mono_samples(pix):
+    gray = numpy.frombuffer(pix.samples_mv, dtype=numpy.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    bits = numpy.packbits(gray < MONO_THRESHOLD, axis=1)
+    return bits.tobytes(), pix.width, pix.height, bits.shape[1], 1, False, 1
+
+def device_rect(rect, dpr):
+    # Widget rectangle in logical pixels -> the raster pixels it covers at this device pixel ratio
+    return QRect(int(rect.x() * dpr), int(rect.y() * dpr), int(rect.width() * dpr) + 1, int(rect.height() * dpr) + 1)
+
+def render_in_worker(path, page_num, zoom, rotation, tile=None, mode="color"):
+    return rasterize(worker_display_list(path, page_num), zoom, rotation, tile, mode)
+
+def rasterize(display_list, zoom, rotation, tile=None, mode="color"):
+    # -> arguments for samples_to_qimage; also what benchmarks/render_bench.py times
+    matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    clip = tile_clip(display_list.rect, matrix, tile) if tile is not None else None
+    colorspace = fitz.csRGB if mode == "color" else fitz.csGRAY
+    pix = qimage_compatible(display_list.get_pixmap(matrix=matrix, colorspace=colorspace, clip=clip))
+    if mode == "mono":
+        return mono_samples(pix)
+    return pix.samples, pix.width, pix.height, pix.stride, pix.n, pix.alpha
+
+# Raster budget shared by all tabs; View > Render Cache Size changes it
+RENDER_CACHE_BYTES = 512 * 1024 * 1024
+
+class RenderCache:
+    def __init__(self, max_bytes=RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (path, page, scale, rotation, tile, mode) -> QImage, oldest first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path, page_num, zoom, rotation=0, tile=None, mode="color"):
+        # zoom is the raster scale, the view zoom times the screen's device pixel ratio
+        return (os.path.abspath(path), page_num, round(zoom, 4), rotation % 360, tile, mode)
+
+    def get(self, key):
+        image = self.entries.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return image
+
+    def put(self, key, image):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old.sizeInBytes()
+        self.entries[key] = image
+        self.size += image.sizeInBytes()
+        self.evict()
+
+    def evict(self, max_bytes=None):
+        # The newest entry is always kept, it is the one on screen
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        while self.size > max_bytes and len(self.entries) > 1:
+            _, image = self.entries.popitem(last=False)
+            self.size -= image.sizeInBytes()
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def discard(self, path, page_num=None):
+        path = os.path.abspath(path)
+        for key in [k for k in self.entries if k[0] == path and (page_num is None or k[1] == page_num)]:
+            self.size -= self.entries.pop(key).sizeInBytes()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def closest(self, key):
+        # Cached full-page raster of the same page at the nearest zoom, for previews
+        path, page_num, zoom, rotation, _, mode = key
+        best = None
+        for entry_key, image in self.entries.items():
+            if entry_key[:2] == (path, page_num) and entry_key[3:] == (rotation, None, mode):
+                distance = max(entry_key[2], zoom) / min(entry_key[2], zoom)
+                if best is None or distance < best[0]:
+                    best = (distance, entry_key, image)
+        return best and (best[2], best[1])
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+def page_to_pixels(rect, page_rect, zoom, rotation):
+    # Page coordinates -> pixel rectangle inside the page raster rendered at zoom/rotation
+    matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    bbox = page_rect * matrix
+    rect = fitz.Rect(rect) * matrix
+    return QRectF(rect.x0 - bbox.x0, rect.y0 - bbox.y0, rect.width, rect.height)
+
+def pixels_to_page(x, y, page_rect, zoom, rotation):
+    # Inverse of page_to_pixels for a single point
+    matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    bbox = page_rect * matrix
+    point = fitz.Point(x + bbox.x0, y + bbox.y0) * ~matrix
+    return point.x, point.y
+
+# Link and word boxes are bucketed into square cells of this many points for hit-testing
+HIT_GRID_CELL = 32
+HIT_INDEX_PAGES = 64
+
+def hit_targets_in_worker(path, page_num):
+    page = worker_document(path).load_page(page_num)
+    # Same page.rect space as the search index
+    rotation_matrix = page.rotation_matrix
+    links = []
+    for link in page.get_links():
+        rect = tuple(link["from"] * rotation_matrix)
+        if link["kind"] == fitz.LINK_URI and link.get("uri"):
+            links.append((rect, "uri", link["uri"]))
+        elif link["kind"] in (fitz.LINK_GOTO, fitz.LINK_NAMED) and link.get("page", -1) >= 0:
+            links.append((rect, "page", link["page"]))
+    words = [(tuple(fitz.Rect(word[:4]) * rotation_matrix), word[4], (word[5], word[6]))
+             for word in page.get_text("words", sort=True)]
+    return links, words
+
+class PageHitIndex:
+    def __init__(self, links, words):
+        self.links = links  # (rect, kind, target)
+        self.words = words  # (rect, text, (block, line)) in reading order
+        self.link_cells = self.build_grid([rect for rect, _, _ in links])
+        self.word_cells = self.build_grid([rect for rect, _, _ in words])
+
+    @staticmethod
+    def cell(value):
+        return int(value // HIT_GRID_CELL)
+
+    @classmethod
+    def build_grid(cls, rects):
+        cells = {}
+        for i, (x0, y0, x1, y1) in enumerate(rects):
+            for col in range(cls.cell(x0), cls.cell(x1) + 1):
+                for row in range(cls.cell(y0), cls.cell(y1) + 1):
+                    cells.setdefault((col, row), []).append(i)
+        return cells
+
+    def find(self, cells, items, x, y):
+        for i in cells.get((self.cell(x), self.cell(y)), ()):
+            x0, y0, x1, y1 = items[i][0]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                return i
+        return None
+
+    def link_at(self, x, y):
+        i = self.find(self.link_cells, self.links, x, y)
+        return None if i is None else self.links[i]
+
+    def word_at(self, x, y):
+        return self.find(self.word_cells, self.words, x, y)
+
+    def nearest_word(self, x, y):
+        # Word under the point, else the closest one in the surrounding cells; keeps drags between words going
+        i = self.word_at(x, y)
+        if i is not None:
+            return i
+        col, row = self.cell(x), self.cell(y)
+        best, best_distance = None, None
+        for c in range(col - 1, col + 2):
+            for r in range(row - 1, row + 2):
+                for i in self.word_cells.get((c, r), ()):
+                    x0, y0, x1, y1 = self.words[i][0]
+                    dx = max(x0 - x, 0, x - x1)
+                    dy = max(y0 - y, 0, y - y1)
+                    distance = dx * dx + dy * dy
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = i, distance
+        return best
+
+    def text(self, first, last):
+        first, last = min(first, last), max(first, last)
+        parts = []
+        for i in range(first, last + 1):
+            if i > first:
+                parts.append("\n" if self.words[i][2] != self.words[i - 1][2] else " ")
+            parts.append(self.words[i][1])
+        return "".join(parts)
+
+if sys.platform == "win32":
+    CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA", os.path.expanduser("~")), "PDFReader", "cache")
+else:
+    CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "PDFReader")
+if sys.platform == "win32":
+    CONFIG_DIR = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "PDFReader")
+else:
+    CONFIG_DIR = os.path.join(os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config")), "PDFReader")
+INDEX_DIR = os.path.join(CACHE_DIR, "index")
+INDEX_BATCH_PAGES = 16
+INDEX_CACHE_BYTES = 256 * 2**20
+THUMB_DIR = os.path.join(CACHE_DIR, "thumbs")
+THUMB_WIDTH = 120
+THUMB_CACHE_BYTES = 128 * 2**20
+REPAIR_DIR = os.path.join(CACHE_DIR, "repaired")
+REPAIR_CACHE_BYTES = 512 * 2**20
+# Larger files are repaired again on every open rather than copied
+REPAIR_MAX_FILE_BYTES = REPAIR_CACHE_BYTES // 4
+
+def document_key(path):
+    # Identifies one version of a file; on-disk caches for a changed file start fresh
+    stat = os.stat(path)
+    version = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(version.encode("utf-8")).hexdigest()
+
+# On-disk caches are trimmed to these sizes, least recently used documents first, a while after startup.
+# Anything used in the last CACHE_PRUNE_MIN_AGE seconds is left alone.
+CACHE_LIMITS = {INDEX_DIR: INDEX_CACHE_BYTES, THUMB_DIR: THUMB_CACHE_BYTES, REPAIR_DIR: REPAIR_CACHE_BYTES}
+CACHE_PRUNE_DELAY_MS = 10000
+CACHE_PRUNE_MIN_AGE = 600
+
+def prune_cache_dir(directory, max_bytes, keep=()):
+    # Everything named after one document key (an index and its WAL files, a thumbnail folder) goes together
+    entries = {}  # document key -> [bytes, last used, paths]
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            files = [os.path.join(root, f) for root, _, fs in os.walk(path) for f in fs] if os.path.isdir(path) else []
+            stats = [os.stat(path)] + [os.stat(f) for f in files]
+        except OSError:
+            continue  # removed meanwhile
+        entry = entries.setdefault(name.split(".")[0], [0, 0, []])
+        entry[0] += sum(stat.st_size for stat in stats)
+        entry[1] = max(entry[1], *(stat.st_mtime for stat in stats))
+        entry[2].append(path)
+    total = sum(entry[0] for entry in entries.values())
+    now = time.time()
+    for key, (size, last_used, paths) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total <= max_bytes:
+            break
+        if key in keep or now - last_used < CACHE_PRUNE_MIN_AGE:
+            continue
+        for path in paths:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+        total -= size
+
+def repaired_path(path):
+    return os.path.join(REPAIR_DIR, document_key(path) + ".pdf")
+
+def open_document(path):
+    # A file MuPDF had to repair is opened from its repaired copy if there is one; doc.name is then the copy's
+    source = repaired_path(path)
+    if os.path.exists(source):
+        with contextlib.suppress(OSError):
+            os.utime(source)  # marks it used for prune_cache_dir
+        return fitz.open(source)
+    doc = fitz.open(path)
+    if doc.needs_pass:
+        doc.close()
+        raise ValueError("password protected documents are not supported")
+    if not doc.page_count:
+        doc.close()
+        raise ValueError("the document has no pages")
+    return doc
+
+def probe_in_worker(path):
+    # Parses (and repairs) the file away from the GUI; the worker keeps it open for the renders after
+    start = time.perf_counter()
+    doc = worker_document(path)
+    return {"page_count": doc.page_count, "metadata": doc.metadata, "repaired": doc.is_repaired,
+            "seconds": time.perf_counter() - start}
+
+def repair_in_worker(path):
+    # Saves the repaired file once its probe has reported, so later opens here and in the GUI skip the xref rebuild
+    doc = worker_document(path)
+    if not doc.is_repaired or os.path.getsize(path) > REPAIR_MAX_FILE_BYTES:
+        return False
+    source = repaired_path(path)
+    temp_path = f"{source}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(REPAIR_DIR, exist_ok=True)
+        doc.save(temp_path, garbage=0)
+        os.replace(temp_path, source)
+    except (RuntimeError, OSError):
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        return False  # only a cache; the file is repaired again on the next open
+    return True
+
+def normalize_term(word):
+    return word.strip(string.punctuation + "“”‘’«»").casefold()
+
+def index_path(path):
+    return os.path.join(INDEX_DIR, document_key(path) + ".sqlite")
+
+def thumbnail_path(doc_key, page_num):
+    return os.path.join(THUMB_DIR, doc_key, f"{page_num}.png")
+
+def thumbnail_in_worker(path, page_num, out_path):
+    page = worker_document(path).load_page(page_num)
+    zoom = THUMB_WIDTH / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Written under a temporary name first so a reader never sees a half-written file
+    temp_path = f"{out_path}.{os.getpid()}.tmp"
+    pix.save(temp_path, output="png")
+    os.replace(temp_path, out_path)
+    return out_path
+
+def index_in_worker(path, db_path, pages):
+    doc = worker_document(path)
+    db = sqlite3.connect(db_path, timeout=60)
+    try:
+        with db:
+            for page_num in pages:
+                page = doc.load_page(page_num)
+                # Word boxes are stored in page.rect space, the space the renderer uses
+                rotation_matrix = page.rotation_matrix
+                rows = []
+                for seq, word in enumerate(page.get_text("words", sort=True)):
+                    term = normalize_term(word[4])
+                    if term:
+                        rect = fitz.Rect(word[:4]) * rotation_matrix
+                        rows.append((term, page_num, seq, rect.x0, rect.y0, rect.x1, rect.y1))
+                db.executemany("INSERT INTO words VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                db.execute("INSERT OR IGNORE INTO pages VALUES (?)", (page_num,))
+    finally:
+        db.close()
+    return path, len(pages)
+
+def page_hashes_in_worker(path, first_page, batch_size):
+    # Hashes the raw page objects and streams, nothing is decompressed or interpreted
+    doc = worker_document(path)
+    hashes = []
+    for page_num in range(first_page, min(doc.page_count, first_page + batch_size)):
+        page_xref = doc.page_xref(page_num)
+        digest = hashlib.sha1(doc.xref_object(page_xref, compressed=True).encode("utf-8"))
+        xrefs = [int(xref) for xref in re.findall(r"(\d+) 0 R", doc.xref_get_key(page_xref, "Contents")[1])]
+        kind, resources = doc.xref_get_key(page_xref, "Resources")
+        if kind == "xref":
+            digest.update(doc.xref_object(int(resources.split()[0]), compressed=True).encode("utf-8"))
+        xrefs += [item[0] for item in doc.get_page_xobjects(page_num)]
+        xrefs += [item[0] for item in doc.get_page_images(page_num)]
+        for xref in xrefs:
+            digest.update(doc.xref_stream_raw(xref) or b"")
+        hashes.append(digest.hexdigest())
+    return file_version(path), doc.page_count, hashes
+
+class TextIndexer(QObject):
+    progress = pyqtSignal(str, int, int)  # path, indexed pages, page count
+    done = pyqtSignal(object)  # future; emitted from the executor thread
+
+    def __init__(self):
+        super().__init__()
+        self.executor = None
+        self.indexes = {}  # path -> [db connection, indexed pages, page count, futures, db path]
+        self.disabled = {}  # path -> why search is off for it
+        self.done.connect(self.on_done)
+
+    @staticmethod
+    def open_index(db_path):
+        db = sqlite3.connect(db_path)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")  # queries keep working while the worker writes
+            db.execute("CREATE TABLE IF NOT EXISTS pages (page INTEGER PRIMARY KEY)")
+            db.execute("CREATE TABLE IF NOT EXISTS words (term TEXT, page INTEGER, seq INTEGER, "
+                       "x0 REAL, y0 REAL, x1 REAL, y1 REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS words_term ON words (term)")
+            db.commit()
+            return db, {row[0] for row in db.execute("SELECT page FROM pages")}
+        except sqlite3.Error:
+            db.close()
+            raise
+
+    @staticmethod
+    def remove_index(db_path):
+        for suffix in ("", "-wal", "-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(db_path + suffix)
+
+    def index(self, path, page_count):
+        path = os.path.abspath(path)
+        if path in self.indexes or path in self.disabled:
+            return
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            db_path = index_path(path)
+            try:
+                db, indexed = self.open_index(db_path)
+            except sqlite3.DatabaseError as e:
+                if isinstance(e, sqlite3.OperationalError):
+                    raise
+                # Corrupt file (a crash or disk error mid-write): this document's index starts over
+                self.remove_index(db_path)
+                db, indexed = self.open_index(db_path)
+            os.utime(db_path)  # marks it used for prune_cache_dir
+        except (sqlite3.Error, OSError) as e:
+            # Search is off for this document; reading it is not affected
+            self.disabled[path] = str(e)
+            self.progress.emit(path, 0, 0)
+            return
+        missing = [page_num for page_num in range(page_count) if page_num not in indexed]
+        futures = []
+        if missing:
+            if self.executor is None:
+                # A single process so indexing never competes with the render workers for long
+                self.executor = worker_pool(1)
+            for start in range(0, len(missing), INDEX_BATCH_PAGES):
+                future = self.executor.submit(index_in_worker, path, db_path, missing[start:start + INDEX_BATCH_PAGES])
+                future.add_done_callback(self.done.emit)
+                futures.append(future)
+        self.indexes[path] = [db, len(indexed), page_count, futures, db_path]
+        self.progress.emit(path, len(indexed), page_count)
+
+    def reload(self, path, page_count, changed):
+        # The file changed: words of unchanged pages move to the new version's index, only changed pages are extracted
+        path = os.path.abspath(path)
+        entry = self.indexes.get(path)
+        self.release(path)
+        if entry is not None:
+            old_db_path = entry[4]
+            try:
+                db_path = index_path(path)
+                if db_path != old_db_path:
+                    db, indexed = self.open_index(db_path)
+                    try:
+                        if not indexed:
+                            db.execute("ATTACH DATABASE ? AS old", (old_db_path,))
+                            with db:
+                                db.execute("CREATE TEMP TABLE changed (page INTEGER PRIMARY KEY)")
+                                db.executemany("INSERT INTO changed VALUES (?)", [(page_num,) for page_num in changed])
+                                for table, columns in (("words", "*"), ("pages", "page")):
+                                    db.execute(f"INSERT INTO {table} SELECT {columns} FROM old.{table} "
+                                               "WHERE page < ? AND page NOT IN temp.changed", (page_count,))
+                            db.execute("DETACH DATABASE old")
+                    finally:
+                        db.close()
+                    self.remove_index(old_db_path)
+            except (sqlite3.Error, OSError):
+                pass  # index() below extracts whatever is missing, or turns search off
+        self.index(path, page_count)
+
+    def on_done(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        path, count = future.result()
+        entry = self.indexes.get(path)
+        if entry and future in entry[3]:  # not a batch of a released or reloaded index
+            entry[1] += count
+            self.progress.emit(path, entry[1], entry[2])
+
+    def status(self, path):
+        entry = self.indexes.get(os.path.abspath(path))
+        return (entry[1], entry[2]) if entry else (0, 0)
+
+    def search(self, path, query):
+        # Phrase search over the pages indexed so far: consecutive words, each matched by prefix
+        entry = self.indexes.get(os.path.abspath(path))
+        terms = [term for term in (normalize_term(word) for word in query.split()) if term]
+        if not entry or not terms:
+            return []
+        db = entry[0]
+        words = []
+        for term in terms:
+            rows = db.execute("SELECT page, seq, x0, y0, x1, y1 FROM words WHERE term >= ? AND term < ?",
+                              (term, term + "\uffff"))
+            words.append({(row[0], row[1]): row[2:] for row in rows})
+        matches = []
+        for page_num, seq in sorted(words[0]):
+            rects = [words[i].get((page_num, seq + i)) for i in range(len(terms))]
+            if all(rects):
+                matches.append((page_num, [fitz.Rect(rect) for rect in rects]))
+        return matches
+
+    def release(self, path):
+        self.disabled.pop(os.path.abspath(path), None)
+        entry = self.indexes.pop(os.path.abspath(path), None)
+        if entry:
+            for future in entry[3]:
+                future.cancel()
+            entry[0].close()
+
+    def shutdown(self):
+        for path in list(self.indexes):
+            self.release(path)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+# Rolling window of timings kept per hook, and trace events kept for export
+PROFILE_SAMPLES = 500
+PROFILE_TRACE_EVENTS = 200000
+PROFILE_BUCKETS_MS = (1, 2, 4, 8, 16, 33, 66, 133, 266, 533, 1066)
+
+class ProfileSpan:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+class Profiler:
+    def __init__(self):
+        # Disabled, a hook costs one attribute check and returns a shared no-op context
+        self.enabled = bool(os.environ.get("PDFREADER_PROFILE"))
+        self.null_span = contextlib.nullcontext()
+        self.samples = {}  # name -> deque of durations in ms
+        self.events = deque(maxlen=PROFILE_TRACE_EVENTS)
+
+    def span(self, name):
+        if not self.enabled:
+            return self.null_span
+        return ProfileSpan(self, name)
+
+    def record(self, name, start, end, async_id=None):
+        if not self.enabled:
+            return
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, deque(maxlen=PROFILE_SAMPLES))
+        samples.append((end - start) * 1000)
+        event = {"name": name, "ts": start * 1e6, "pid": os.getpid(), "tid": threading.get_ident()}
+        if async_id is None:
+            self.events.append(dict(event, ph="X", dur=(end - start) * 1e6))
+        else:
+            # Spans that overlap on one thread go on their own async track
+            self.events.append(dict(event, ph="b", cat=name, id=async_id))
+            self.events.append(dict(event, ph="e", cat=name, id=async_id, ts=end * 1e6))
+
+    def summary(self, name):
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return None
+        return {
+            "count": len(samples),
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
+
+    def histogram(self, name):
+        # Count of samples at or below each bucket bound; the last entry is everything slower
+        counts = [0] * (len(PROFILE_BUCKETS_MS) + 1)
+        for sample in self.samples.get(name, ()):
+            counts[bisect_left(PROFILE_BUCKETS_MS, sample)] += 1
+        return counts
+
+    def histograms(self):
+        return {name: self.histogram(name) for name in sorted(self.samples)}
+
+    def clear(self):
+        self.samples.clear()
+        self.events.clear()
+
+    def export_trace(self, path):
+        # Chrome trace event format, loads in chrome://tracing and Perfetto
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms",
+                       "metadata": {"histogram_bounds_ms": PROFILE_BUCKETS_MS, "histograms": self.histograms()}}, f)
+
+profiler = Profiler()
+
+class RenderPool(QObject):
+    rendered = pyqtSignal(object, object)  # key, QImage
+    thumbnail_rendered = pyqtSignal(object, object)  # key, QImage
+    failed = pyqtSignal(object, str)  # key, error message
+    done = pyqtSignal(object, object)  # key, future; emitted from the executor thread
+
+    def __init__(self, workers=RENDER_WORKERS):
+        super().__init__()
+        self.workers = workers
+        self.executor = None
+        self.spawned = False  # until the first pool starts, the GUI renders the first page itself
+        self.pending = {}  # key -> (future, owner, finish, executor, fn, args)
+        self.started = {}  # key -> submit time, kept while profiling
+        self.retries = deque()  # (key, owner, finish, fn, args) of jobs a worker crash took down
+        self.retrying = None  # key of the one being run again
+        self.done.connect(self.on_done)
+
+    def request(self, key, owner, path, page_num, zoom, rotation, tile=None, mode="color"):
+        self.submit(key, owner, lambda result: self.rendered.emit(key, self.convert(result)),
+                    render_in_worker, path, page_num, zoom, rotation, tile, mode)
+
+    def convert(self, result):
+        with profiler.span("convert"):
+            return samples_to_qimage(*result)
+
+    def request_thumbnail(self, key, owner, path, page_num, out_path):
+        self.submit(key, owner, lambda result: self.thumbnail_rendered.emit(key, QImage(result)),
+                    thumbnail_in_worker, path, page_num, out_path)
+
+    def submit(self, key, owner, finish, fn, *args):
+        if key in self.pending:
+            return
+        if self.executor is None:
+            self.executor = worker_pool(self.workers)
+            self.spawned = True
+        try:
+            future = self.executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker crashed and the pool noticed before its futures reported it
+            self.executor = worker_pool(self.workers)
+            future = self.executor.submit(fn, *args)
+        self.pending[key] = (future, owner, finish, self.executor, fn, args)
+        if profiler.enabled:
+            self.started[key] = time.perf_counter()
+        future.add_done_callback(lambda f, key=key: self.done.emit(key, f))
+
+    def cancel(self, owner, keep=()):
+        for key, (future, key_owner, *_) in list(self.pending.items()):
+            if key_owner == owner and key not in keep and future.cancel():
+                self.pending.pop(key, None)
+                self.started.pop(key, None)
+                if key == self.retrying:
+                    self.retrying = None
+        self.retries = deque(job for job in self.retries if job[1] != owner or job[0] in keep)
+        self.retry_next()
+
+    def on_done(self, key, future):
+        if self.pending.get(key, (None,))[0] is not future:
+            return
+        _, owner, finish, executor, fn, args = self.pending.pop(key)
+        started = self.started.pop(key, None)
+        rerun = key == self.retrying
+        if rerun:
+            self.retrying = None
+        error = None if future.cancelled() else future.exception()
+        crashed = isinstance(error, BrokenProcessPool)
+        if crashed:
+            if executor is self.executor:
+                self.executor.shutdown(wait=False)
+                self.executor = None  # the next submit starts a fresh pool
+            if not rerun:
+                # Every job in flight fails with the pool. They run again one at a time, so a job
+                # that keeps killing its worker fails alone instead of taking the others down again
+                self.retries.append((key, owner, finish, fn, args))
+        self.retry_next()
+        if future.cancelled() or (crashed and not rerun):
+            return
+        if started is not None:
+            name = {"thumb": "thumbnail", "hits": "hit_index", "hashes": "page_hashes",
+                    "open": "open_worker", "reopen": "open_worker",
+                    "repair": "repair_worker"}.get(key[0], "render")
+            profiler.record(name, started, time.perf_counter(), async_id=str(key))
+        if crashed:
+            self.failed.emit(key, "render worker stopped unexpectedly")
+            return
+        if error is not None:
+            self.failed.emit(key, str(error))
+            return
+        finish(future.result())
+
+    def retry_next(self):
+        while self.retrying is None and self.retries:
+            key, owner, finish, fn, args = self.retries.popleft()
+            if key not in self.pending:  # requested again meanwhile, that request stands
+                self.submit(key, owner, finish, fn, *args)
+                self.retrying = key
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.pending.clear()
+        self.started.clear()
+        self.retries.clear()
+        self.retrying = None
+
+# Renders are coalesced to at most one per frame
+FRAME_MS = 16
+
+class RenderScheduler(QObject):
+    def __init__(self, render, target):
+        super().__init__()
+        self.render = render
+        self.target = target  # callable returning the current (page, zoom, mode, size)
+        self.last_target = None
+        self.force = False
+        self.requested = 0
+        self.performed = 0
+        self.clock = QElapsedTimer()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def schedule(self, force=False):
+        self.requested += 1
+        self.force = self.force or force
+        if not self.timer.isActive():
+            wait = FRAME_MS - self.clock.elapsed() if self.clock.isValid() else 0
+            self.timer.start(max(0, wait))
+
+    def flush(self):
+        target = self.target()
+        if target == self.last_target and not self.force:
+            return  # everything requested since the last frame is already on screen
+        self.force = False
+        self.last_target = target
+        self.performed += 1
+        self.clock.start()
+        with profiler.span("render_page"):
+            self.render()
+
+    def stop(self):
+        self.timer.stop()
+
+    def stats(self):
+        return {
+            "requested": self.requested,
+            "performed": self.performed,
+            "dropped": self.requested - self.performed,
+        }
+
 class PDFCanvas(QWidget):
     def __init__(self, parent, tab_id, pdf_reader):
         super().__init__(parent)
         self.tab_id = tab_id
         self.pdf_reader = pdf_reader
-        self.image = None
+        self.image_key = None  # render cache key of the raster shown, its zoom may differ from the current one
+        self.pixmap = None  # that raster converted for the screen; the QImage itself is only kept by the cache
+        self.page_size = None  # size (width, height) of the page at the current zoom, in logical pixels
+        self.raster_size = None  # the same in device pixels, the size of the raster
+        self.tiled = False
+        self.tiles = {}  # (col, row) -> QPixmap, only used in tiled mode
+        self.page_rect = None  # geometry of the shown page, used to map page coordinates
+        self.zoom = 1.0
+        self.dpr = 1.0
+        self.rotation = 0
         self.setMouseTracking(True)
+        self.pressed_link = None
+        self.select_anchor = None  # (page_num, word index) where a text selection drag started
         self.zoom_rect_start = None
         self.setAcceptDrops(True)
 
+    def image_offset(self, width, height):
+        x = (self.width() - width) // 2 if self.width() > width else 0
+        y = (self.height() - height) // 2 if self.height() > height else 0
+        return x, y
+
+    def set_image(self, image, key):
+        # Converted once per raster, repaints only blit
+        self.pixmap = QPixmap.fromImage(image) if image is not None else None
+        self.image_key = key
+        self.update()
+
     def paintEvent(self, event):
-        painter = QPainter(self)
-        if self.image:
-            pixmap = QPixmap.fromImage(self.image)
-            x = (self.width() - pixmap.width()) // 2 if self.width() > pixmap.width() else 0
-            y = (self.height() - pixmap.height()) // 2 if self.height() > pixmap.height() else 0
-            painter.drawPixmap(x, y, pixmap)
-
-        if self.zoom_rect_start and hasattr(self, 'zoom_rect_end'):
-            painter.setPen(Qt.red)
-            rect = QRect(self.zoom_rect_start, self.zoom_rect_end)
-            painter.drawRect(rect)
+        with profiler.span("paint"):
+            painter = QPainter(self)
+            if self.page_size:
+                x, y = self.image_offset(*self.page_size)
+                if self.pixmap is not None:
+                    if self.image_key == self.pdf_reader.render_targets.get(self.tab_id):
+                        target = QRectF(x, y, self.pixmap.width() / self.dpr, self.pixmap.height() / self.dpr)
+                        painter.drawPixmap(target, self.pixmap, QRectF(self.pixmap.rect()))
+                        if STARTUP_BENCHMARK:
+                            self.pdf_reader.startup_finished()
+                    else:
+                        # Another zoom level of this page, scaled until the sharp render arrives
+                        painter.drawPixmap(QRectF(x, y, *self.page_size), self.pixmap, QRectF(self.pixmap.rect()))
+                for (col, row), tile in self.tiles.items():
+                    target = QRectF(x + col * TILE_SIZE / self.dpr, y + row * TILE_SIZE / self.dpr,
+                                    tile.width() / self.dpr, tile.height() / self.dpr)
+                    if target.intersects(QRectF(event.rect())):
+                        painter.drawPixmap(target, tile, QRectF(tile.rect()))
+                self.pdf_reader.paint_search_hits(painter, self.tab_id, self.pdf_reader.current_pages[self.tab_id],
+                                                  self.page_rect, self.zoom, self.rotation, x, y)
+                self.pdf_reader.paint_selection(painter, self.tab_id, self.pdf_reader.current_pages[self.tab_id],
+                                                self.page_rect, self.zoom, self.rotation, x, y)
+
+            if self.zoom_rect_start and hasattr(self, 'zoom_rect_end'):
+                painter.setPen(Qt.red)
+                rect = QRect(self.zoom_rect_start, self.zoom_rect_end)
+                painter.drawRect(rect)
+
+    def hit_test(self, pos):
+        # Returns the page's hit index and the point in page coordinates, or (None, None) while it is being built
+        if not self.page_size or self.page_rect is None:
+            return None, None
+        index = self.pdf_reader.hit_index(self.tab_id, self.pdf_reader.current_pages[self.tab_id])
+        if index is None:
+            return None, None
+        x, y = self.image_offset(*self.page_size)
+        return index, pixels_to_page(pos.x() - x, pos.y() - y, self.page_rect, self.zoom, self.rotation)
+
+    def set_cursor_shape(self, shape):
+        if self.cursor().shape() != shape:
+            self.setCursor(shape)
 
     def mousePressEvent(self, event):
         if self.pdf_reader.zoom_mode == 'rectangle':
             self.zoom_rect_start = event.pos()
             self.zoom_rect_end = event.pos()
             self.update()
+            return
+        if event.button() != Qt.LeftButton:
+            return
+        self.pressed_link = None
+        self.select_anchor = None
+        self.pdf_reader.clear_selection(self.tab_id)
+        index, point = self.hit_test(event.pos())
+        if index is None:
+            return
+        self.pressed_link = index.link_at(*point)
+        if self.pressed_link is None:
+            word = index.nearest_word(*point)
+            if word is not None:
+                self.select_anchor = (self.pdf_reader.current_pages[self.tab_id], word)
 
     def mouseMoveEvent(self, event):
         if self.pdf_reader.zoom_mode == 'rectangle' and self.zoom_rect_start:
+            # Only the band's old and new outline are repainted
+            old = QRect(self.zoom_rect_start, self.zoom_rect_end).normalized()
             self.zoom_rect_end = event.pos()
-            self.update()
+            new = QRect(self.zoom_rect_start, self.zoom_rect_end).normalized()
+            self.update(old.united(new).adjusted(-2, -2, 2, 2))
+            return
+        index, point = self.hit_test(event.pos())
+        if index is None:
+            self.set_cursor_shape(Qt.ArrowCursor)
+            return
+        page_num = self.pdf_reader.current_pages[self.tab_id]
+        if event.buttons() & Qt.LeftButton and self.select_anchor and self.select_anchor[0] == page_num:
+            word = index.nearest_word(*point)
+            if word is not None:
+                self.pdf_reader.select_words(self.tab_id, page_num, self.select_anchor[1], word)
+            self.set_cursor_shape(Qt.IBeamCursor)
+        elif index.link_at(*point):
+            self.set_cursor_shape(Qt.PointingHandCursor)
+        elif index.word_at(*point) is not None:
+            self.set_cursor_shape(Qt.IBeamCursor)
+        else:
+            self.set_cursor_shape(Qt.ArrowCursor)
 
     def mouseReleaseEvent(self, event):
+        if self.pressed_link is not None:
+            index, point = self.hit_test(event.pos())
+            if index is not None and index.link_at(*point) == self.pressed_link:
+                self.pdf_reader.follow_link(self.tab_id, self.pressed_link)
+            self.pressed_link = None
+        self.select_anchor = None
         if self.pdf_reader.zoom_mode == 'rectangle' and self.zoom_rect_start:
             x1, y1 = self.zoom_rect_start.x(), self.zoom_rect_start.y()
             x2, y2 = event.pos().x(), event.pos().y()
@@ -147,7 +1117,7 @@ class PDFCanvas(QWidget):
                 zoom_y = self.height() / height
                 new_zoom = min(zoom_x, zoom_y) * self.pdf_reader.zoom_levels.get(self.tab_id, 1.0)
                 self.pdf_reader.zoom_levels[self.tab_id] = new_zoom
-                self.pdf_reader.render_page(self.tab_id)
+                self.pdf_reader.schedule_render(self.tab_id)
             self.zoom_rect_start = None
             self.zoom_rect_end = None
             self.pdf_reader.zoom_mode = None
@@ -173,24 +1143,1075 @@ class PDFCanvas(QWidget):
                 self.pdf_reader.save_recent_files()
                 self.pdf_reader.update_recent_menu()
 
+# Vertical gap between pages in continuous mode
+PAGE_GAP = 10
+
+class ContinuousView(QAbstractScrollArea):
+    def __init__(self, parent, tab_id, pdf_reader, pdf_doc):
+        super().__init__(parent)
+        self.tab_id = tab_id
+        self.pdf_reader = pdf_reader
+        self.path = pdf_reader.doc_paths[tab_id]
+        # Layout only needs the page sizes, read once; nothing here grows with rendering
+        self.page_rects = [pdf_reader.page_rect(tab_id, n) for n in range(pdf_doc.page_count)]
+        self.zoom = None
+        self.rotation = None
+        self.dpr = 1.0
+        self.mode = "color"
+        self.sizes = []  # (width, height) of every page at the current zoom, in logical pixels
+        self.raster_sizes = []  # the same in device pixels
+        self.offsets = [0]  # top of every page, offsets[-1] is the total height
+        self.content_width = 0
+        self.visible = range(0)
+        self.pages = {}  # realized pages only: page_num -> {tile or None: QPixmap}
+        self.previews = {}  # page_num -> another zoom of a page not rendered yet, scaled once; None if there is none
+        self.viewport().setStyleSheet(f"background-color: {colors['canvas_bg']};")
+        self.setAcceptDrops(True)
+        self.verticalScrollBar().setSingleStep(40)
+        self.horizontalScrollBar().setSingleStep(40)
+        self.verticalScrollBar().valueChanged.connect(self.update_visible)
+        self.horizontalScrollBar().valueChanged.connect(self.update_visible)
+
+    def set_view(self, zoom, rotation, dpr=1.0, mode="color"):
+        if (zoom, rotation, dpr, mode) == (self.zoom, self.rotation, self.dpr, self.mode):
+            return
+        anchor = self.current_page()
+        fraction = 0.0
+        if self.sizes:
+            fraction = (self.verticalScrollBar().value() - self.offsets[anchor]) / max(1, self.sizes[anchor][1])
+        anchor = min(anchor, len(self.page_rects) - 1)
+        self.zoom = zoom
+        self.rotation = rotation
+        self.dpr = dpr
+        self.mode = mode
+        self.pages = {}
+        self.previews = {}
+        matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+        self.sizes = [(irect.width, irect.height) for irect in ((rect * matrix).irect for rect in self.page_rects)]
+        matrix = fitz.Matrix(zoom * dpr, zoom * dpr).prerotate(rotation)
+        self.raster_sizes = [(irect.width, irect.height)
+                             for irect in ((rect * matrix).irect for rect in self.page_rects)]
+        self.offsets = list(accumulate((height + PAGE_GAP for _, height in self.sizes), initial=0))
+        self.content_width = max((width for width, _ in self.sizes), default=0)
+        self.update_scrollbars()
+        self.verticalScrollBar().setValue(self.offsets[anchor] + int(fraction * self.sizes[anchor][1]))
+        self.update_visible()
+
+    def update_scrollbars(self):
+        viewport = self.viewport()
+        self.verticalScrollBar().setRange(0, max(0, self.offsets[-1] - viewport.height()))
+        self.verticalScrollBar().setPageStep(viewport.height())
+        self.horizontalScrollBar().setRange(0, max(0, self.content_width - viewport.width()))
+        self.horizontalScrollBar().setPageStep(viewport.width())
+
+    def current_page(self):
+        if not self.sizes:
+            return 0
+        middle = self.verticalScrollBar().value() + self.viewport().height() // 2
+        return min(len(self.sizes) - 1, max(0, bisect_right(self.offsets, middle) - 1))
+
+    def show_page(self, page_num):
+        if self.sizes and page_num != self.current_page():
+            self.verticalScrollBar().setValue(self.offsets[page_num])
+
+    def page_origin(self, page_num):
+        width = self.sizes[page_num][0]
+        x = (max(self.content_width, self.viewport().width()) - width) // 2 - self.horizontalScrollBar().value()
+        return x, self.offsets[page_num] - self.verticalScrollBar().value()
+
+    def page_key(self, page_num, tile=None):
+        return RenderCache.key(self.path, page_num, self.zoom * self.dpr, self.rotation, tile, self.mode)
+
+    def reload(self, changed):
+        page_rects = [self.pdf_reader.page_rect(self.tab_id, n)
+                      for n in range(self.pdf_reader.pdf_docs[self.tab_id].page_count)]
+        if page_rects != self.page_rects:
+            self.page_rects = page_rects
+            self.zoom = None  # laid out again on the next render
+        else:
+            for page_num in changed:
+                self.pages.pop(page_num, None)
+                self.previews.pop(page_num, None)
+            self.update_visible()
+
+    def update_visible(self):
+        if not self.sizes:
+            return
+        reader = self.pdf_reader
+        top = self.verticalScrollBar().value()
+        height = self.viewport().height()
+        # One viewport of margin above and below
+        first = max(0, bisect_right(self.offsets, top - height) - 1)
+        last = min(len(self.sizes) - 1, bisect_right(self.offsets, top + 2 * height) - 1)
+        self.visible = range(first, last + 1)
+        wanted = set()
+        pages = {}
+        for page_num in self.visible:
+            width, page_height = self.raster_sizes[page_num]
+            if width * page_height > TILED_MIN_PIXELS:
+                x, y = self.page_origin(page_num)
+                area = device_rect(QRect(-x, -y, self.viewport().width(), height), self.dpr)
+                area.adjust(-TILE_MARGIN, -TILE_MARGIN, TILE_MARGIN, TILE_MARGIN)
+                tiles = visible_tiles(width, page_height, area)
+            else:
+                tiles = [None]
+            realized = self.pages.get(page_num, {})
+            for tile in tiles:
+                key = self.page_key(page_num, tile)
+                pixmap = realized.get(tile)
+                if pixmap is None:
+                    image = reader.render_cache.get(key)
+                    pixmap = QPixmap.fromImage(image) if image is not None else None
+                if pixmap is not None:
+                    pages.setdefault(page_num, {})[tile] = pixmap
+                else:
+                    wanted.add(key)
+                    reader.render_pool.request(key, self.tab_id, self.path, page_num, self.zoom * self.dpr,
+                                               self.rotation, tile, self.mode)
+        # Everything that scrolled out of range is released here and only lives on in the LRU cache
+        self.pages = pages
+        self.previews = {page_num: preview for page_num, preview in self.previews.items()
+                         if page_num in self.visible and None not in pages.get(page_num, {})}
+        reader.render_pool.cancel(self.tab_id, keep=wanted)
+        reader.on_continuous_scroll(self.tab_id, self.current_page())
+        self.viewport().update()
+
+    def on_rendered(self, key, qimage):
+        if not self.sizes:
+            return  # not laid out yet, the first update_visible will pick the raster up from the cache
+        current = self.page_key(0)
+        if key[0] == current[0] and key[2:4] == current[2:4] and key[5] == current[5] and key[1] in self.visible:
+            self.pages.setdefault(key[1], {})[key[4]] = QPixmap.fromImage(qimage)
+            self.viewport().update()
+
+    def paintEvent(self, event):
+        with profiler.span("paint"):
+            painter = QPainter(self.viewport())
+            for page_num in self.visible:
+                x, y = self.page_origin(page_num)
+                width, height = self.sizes[page_num]
+                page_rect = QRect(x, y, width, height)
+                if not page_rect.intersects(event.rect()):
+                    continue
+                pixmaps = self.pages.get(page_num, {})
+                if None in pixmaps:
+                    pixmap = pixmaps[None]
+                    target = QRectF(x, y, pixmap.width() / self.dpr, pixmap.height() / self.dpr)
+                    painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+                    continue
+
+                painter.fillRect(page_rect, Qt.white)
+                if page_num not in self.previews:
+                    self.previews[page_num] = self.preview(page_num)
+                preview = self.previews[page_num]
+                if preview is not None:
+                    painter.drawPixmap(QRectF(page_rect), preview, QRectF(preview.rect()))
+                for (col, row), tile in pixmaps.items():
+                    target = QRectF(x + col * TILE_SIZE / self.dpr, y + row * TILE_SIZE / self.dpr,
+                                    tile.width() / self.dpr, tile.height() / self.dpr)
+                    painter.drawPixmap(target, tile, QRectF(tile.rect()))
+            for page_num in self.visible:
+                x, y = self.page_origin(page_num)
+                self.pdf_reader.paint_search_hits(painter, self.tab_id, page_num, self.page_rects[page_num],
+                                                  self.zoom, self.rotation, x, y)
+
+    def preview(self, page_num):
+        # Looked up and scaled to the page's raster size once, not on every paint
+        closest = self.pdf_reader.render_cache.closest(self.page_key(page_num))
+        if closest is None:
+            return None
+        width, height = self.raster_sizes[page_num]
+        return QPixmap.fromImage(closest[0].scaled(width, height))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.sizes:
+            self.update_scrollbars()
+            self.update_visible()
+
+    def wheelEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier:
+            PDFCanvas.wheelEvent(self, event)
+        else:
+            super().wheelEvent(event)
+
+    dragEnterEvent = PDFCanvas.dragEnterEvent
+    dropEvent = PDFCanvas.dropEvent
+
+# Thumbnails kept decoded around the visible ones; the rest are reloaded from disk when needed
+THUMB_KEEP_ROWS = 20
+
+class ThumbnailBar(QListWidget):
+    def __init__(self, parent, tab_id, pdf_reader, pdf_doc):
+        super().__init__(parent)
+        self.tab_id = tab_id
+        self.pdf_reader = pdf_reader
+        self.path = pdf_reader.doc_paths[tab_id]
+        self.doc_key = document_key(self.path)
+        with contextlib.suppress(OSError):
+            os.utime(os.path.dirname(thumbnail_path(self.doc_key, 0)))  # marks it used for prune_cache_dir
+        self.loaded = set()
+        self.setViewMode(QListView.ListMode)
+        self.setIconSize(QSize(THUMB_WIDTH, THUMB_WIDTH * 3 // 2))
+        self.setUniformItemSizes(True)
+        self.setFixedWidth(THUMB_WIDTH + 40)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.set_page_count(pdf_doc.page_count)
+        self.setFlow(QListView.TopToBottom)
+        self.itemClicked.connect(lambda item: pdf_reader.go_to_page(tab_id, self.row(item)))
+        self.verticalScrollBar().valueChanged.connect(self.request_visible)
+
+    def set_page_count(self, page_count):
+        while self.count() > page_count:
+            self.loaded.discard(self.count() - 1)
+            self.takeItem(self.count() - 1)
+        for page_num in range(self.count(), page_count):
+            item = QListWidgetItem(str(page_num + 1))
+            item.setTextAlignment(Qt.AlignHCenter | Qt.AlignBottom)
+            item.setSizeHint(QSize(THUMB_WIDTH + 16, THUMB_WIDTH * 3 // 2 + 24))
+            self.addItem(item)
+
+    def reload(self, pdf_doc, changed, doc_key):
+        old_key, self.doc_key = self.doc_key, doc_key
+        old_dir = os.path.dirname(thumbnail_path(old_key, 0))
+        new_dir = os.path.dirname(thumbnail_path(self.doc_key, 0))
+        if old_key != self.doc_key and os.path.isdir(old_dir):
+            # Thumbnails of unchanged pages carry over to the new version of the file
+            os.makedirs(new_dir, exist_ok=True)
+            for name in os.listdir(old_dir):
+                stem, ext = os.path.splitext(name)
+                if ext == ".png" and stem.isdigit() and int(stem) not in changed:
+                    with contextlib.suppress(OSError):
+                        os.replace(os.path.join(old_dir, name), os.path.join(new_dir, name))
+        self.set_page_count(pdf_doc.page_count)
+        for page_num in changed:
+            if page_num in self.loaded:
+                self.item(page_num).setIcon(QIcon())
+                self.loaded.discard(page_num)
+        self.request_visible()
+
+    def visible_rows(self):
+        if not self.count():
+            return range(0)
+        first = self.indexAt(QPoint(5, 5)).row()
+        last = self.indexAt(QPoint(5, self.viewport().height() - 5)).row()
+        return range(max(0, first), (last if last >= 0 else self.count() - 1) + 1)
+
+    def request_visible(self):
+        rows = self.visible_rows()
+        keep = range(max(0, rows.start - THUMB_KEEP_ROWS), rows.stop + THUMB_KEEP_ROWS)
+        for page_num in [row for row in self.loaded if row not in keep]:
+            self.item(page_num).setIcon(QIcon())
+            self.loaded.discard(page_num)
+        wanted = set()
+        for page_num in rows:
+            if page_num in self.loaded:
+                continue
+            out_path = thumbnail_path(self.doc_key, page_num)
+            if os.path.exists(out_path):
+                self.set_thumbnail(page_num, QImage(out_path))
+            else:
+                key = ("thumb", self.doc_key, page_num)
+                wanted.add(key)
+                self.pdf_reader.render_pool.request_thumbnail(key, f"{self.tab_id}_thumbs", self.path,
+                                                              page_num, out_path)
+        self.pdf_reader.render_pool.cancel(f"{self.tab_id}_thumbs", keep=wanted)
+
+    def set_thumbnail(self, page_num, image):
+        if not image.isNull():
+            self.item(page_num).setIcon(QIcon(QPixmap.fromImage(image)))
+            self.loaded.add(page_num)
+
+    def on_thumbnail(self, key, image):
+        if key[1] == self.doc_key and key[2] in self.visible_rows():
+            self.set_thumbnail(key[2], image)
+
+    def show_page(self, page_num):
+        self.blockSignals(True)
+        self.setCurrentRow(page_num)
+        self.blockSignals(False)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.request_visible()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.request_visible()
+
+# Batch export; pages are handed to workers in small chunks so they balance and cancel quickly
+EXPORT_WORKERS = os.cpu_count() or 1
+EXPORT_CHUNK_PAGES = 4
+EXPORT_FORMATS = {"png": "png", "jpeg": "jpg", "raw": "raw"}
+EXPORT_COLORSPACES = ("rgb", "gray")
+EXPORT_JPEG_QUALITY = 90
+
+def parse_page_ranges(spec, page_count):
+    # "all", or 1-based pages and ranges: "1-10,20,30-", "last", "-3" (the last three)
+    if not spec or spec == "all":
+        return list(range(page_count))
+    pages = []
+    for part in spec.split(","):
+        part = part.strip()
+        try:
+            if part == "last":
+                pages.append(page_count - 1)
+            elif part.startswith("-"):
+                pages.extend(range(max(0, page_count - int(part[1:])), page_count))
+            elif "-" in part:
+                first, last = part.split("-")
+                pages.extend(range(int(first) - 1, int(last) if last else page_count))
+            elif part:
+                pages.append(int(part) - 1)
+        except ValueError:
+            raise ValueError(f"invalid page range {part!r}") from None
+    return [page for page in dict.fromkeys(pages) if 0 <= page < page_count]
+
+def export_pages_in_worker(path, page_spec):
+    # Opening a large or damaged file can take seconds, so page counts come from the workers too
+    return parse_page_ranges(page_spec, worker_document(path).page_count)
+
+def export_in_worker(path, pages, out_dir, dpi, colorspace, fmt, quality):
+    doc = worker_document(path)
+    os.makedirs(out_dir, exist_ok=True)
+    digits = len(str(doc.page_count))
+    colorspace = fitz.csGRAY if colorspace == "gray" else fitz.csRGB
+    written = []
+    for page_num in pages:
+        pix = doc.load_page(page_num).get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+        name = f"page-{page_num + 1:0{digits}d}.{EXPORT_FORMATS[fmt]}"
+        out_path = os.path.join(out_dir, name)
+        # Each page goes to disk before the next is rendered; temp names keep cancelled pages out
+        temp_path = f"{out_path}.{os.getpid()}.tmp"
+        if fmt == "raw":
+            with open(temp_path, "wb") as f:
+                f.write(pix.samples_mv)
+        else:
+            pix.save(temp_path, output=fmt, jpg_quality=quality)
+        os.replace(temp_path, out_path)
+        written.append({"page": page_num + 1, "file": name, "width": pix.width, "height": pix.height,
+                        "stride": pix.stride, "n": pix.n})
+        del pix
+    return out_dir, written
+
+def export_dirs(paths, out_dir):
+    # -> document out dir for each path; every document gets a folder named after it
+    dirs = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        doc_dir = os.path.join(out_dir, stem)
+        suffix = 2
+        while doc_dir in dirs:
+            doc_dir = os.path.join(out_dir, f"{stem}_{suffix}")
+            suffix += 1
+        dirs.append(doc_dir)
+    return dirs
+
+def export_jobs(path, pages, doc_dir):
+    # -> [(path, pages, document out dir)]
+    return [(os.path.abspath(path), pages[start:start + EXPORT_CHUNK_PAGES], doc_dir)
+            for start in range(0, len(pages), EXPORT_CHUNK_PAGES)]
+
+def export_failure_text(failed):
+    return "\n".join(f"{os.path.basename(path)}: {error}" for path, error in failed.items())
+
+def write_export_manifest(doc_dir, entries, dpi, colorspace):
+    # Raw samples have no header; the sizes needed to read them back are kept next to them
+    manifest = {"dpi": dpi, "colorspace": colorspace, "pages": sorted(entries, key=lambda e: e["page"])}
+    with open(os.path.join(doc_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+class BatchExporter(QObject):
+    progress = pyqtSignal(int, int)  # pages written, pages total
+    finished = pyqtSignal(str)  # one line per failed file, empty when every page was written
+    done = pyqtSignal(object)  # future; emitted from the executor thread
+
+    def __init__(self, workers=EXPORT_WORKERS):
+        super().__init__()
+        self.workers = workers
+        self.executor = None
+        self.futures = {}  # future -> (path, document out dir, worker function)
+        self.written = 0
+        self.total = 0
+        self.manifests = {}
+        self.failed = {}
+        self.done.connect(self.on_done)
+
+    def start(self, paths, page_spec, out_dir, dpi, colorspace, fmt, quality=EXPORT_JPEG_QUALITY):
+        self.cancel()
+        parse_page_ranges(page_spec, 0)  # a bad spec fails here rather than once per file
+        self.settings = (dpi, colorspace, fmt, quality)
+        self.written = 0
+        self.total = 0
+        self.manifests = {}
+        self.failed = {}
+        if not paths:
+            self.finished.emit("")
+            return
+        self.executor = worker_pool(self.workers)
+        for path, doc_dir in zip(paths, export_dirs(paths, out_dir)):
+            self.submit(path, doc_dir, export_pages_in_worker, path, page_spec)
+        self.progress.emit(0, self.total)
+
+    def submit(self, path, doc_dir, fn, *args):
+        try:
+            future = self.executor.submit(fn, *args)
+        except BrokenProcessPool as e:
+            self.failed.setdefault(path, str(e))
+            return
+        self.futures[future] = (path, doc_dir, fn)
+        future.add_done_callback(self.done.emit)
+
+    def on_done(self, future):
+        if future not in self.futures:
+            return
+        path, doc_dir, fn = self.futures.pop(future)
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            # The other files go on; this one's remaining pages are dropped
+            self.failed.setdefault(path, str(error) or type(error).__name__)
+            for other, (other_path, _, _) in list(self.futures.items()):
+                if other_path == path:
+                    other.cancel()
+        elif future.cancelled() or path in self.failed:
+            pass
+        elif fn is export_pages_in_worker:
+            dpi, colorspace, fmt, quality = self.settings
+            pages = future.result()
+            self.total += len(pages)
+            self.manifests[doc_dir] = []
+            for job in export_jobs(path, pages, doc_dir):
+                self.submit(path, doc_dir, export_in_worker, *job, dpi, colorspace, fmt, quality)
+        else:
+            _, written = future.result()
+            self.manifests[doc_dir].extend(written)
+            self.written += len(written)
+        self.progress.emit(self.written, self.total)
+        if not self.futures:
+            dpi, colorspace, fmt, _ = self.settings
+            if fmt == "raw":
+                for doc_dir, entries in self.manifests.items():
+                    if entries:
+                        write_export_manifest(doc_dir, entries, dpi, colorspace)
+            self.executor.shutdown(wait=False)
+            self.executor = None
+            self.finished.emit(export_failure_text(self.failed))
+
+    def cancel(self):
+        futures, self.futures = self.futures, {}  # cancel() runs the done callbacks right away
+        for future in futures:
+            future.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def running(self):
+        return bool(self.futures)
+
+class ExportDialog(QDialog):
+    def __init__(self, parent, paths):
+        super().__init__(parent)
+        self.setWindowTitle("Batch Export (Toplu Dışa Aktarma)")
+        self.exporter = BatchExporter()
+        self.exporter.progress.connect(self.on_progress)
+        self.exporter.finished.connect(self.on_finished)
+        layout = QFormLayout(self)
+
+        self.files = QListWidget()
+        self.files.addItems(paths)
+        self.files.setFixedHeight(90)
+        layout.addRow("Files", self.files)
+        add_button = QPushButton("Add...")
+        add_button.clicked.connect(self.add_files)
+        layout.addRow("", add_button)
+
+        self.pages = QLineEdit("all")
+        self.pages.setToolTip("all, or pages and ranges like 1-10,20,30-")
+        layout.addRow("Pages", self.pages)
+        self.dpi = QSpinBox()
+        self.dpi.setRange(30, 1200)
+        self.dpi.setValue(150)
+        layout.addRow("DPI", self.dpi)
+        self.colorspace = QComboBox()
+        self.colorspace.addItems(EXPORT_COLORSPACES)
+        layout.addRow("Colorspace", self.colorspace)
+        self.format = QComboBox()
+        self.format.addItems(EXPORT_FORMATS)
+        layout.addRow("Format", self.format)
+
+        out_row = QWidget()
+        out_layout = QHBoxLayout(out_row)
+        out_layout.setContentsMargins(0, 0, 0, 0)
+        self.out_dir = QLineEdit(os.path.dirname(paths[0]) if paths else os.path.expanduser("~"))
+        out_layout.addWidget(self.out_dir)
+        browse_button = QPushButton("Browse...")
+        browse_button.clicked.connect(self.browse)
+        out_layout.addWidget(browse_button)
+        layout.addRow("Output", out_row)
+
+        self.progress_bar = QProgressBar()
+        layout.addRow(self.progress_bar)
+        buttons = QWidget()
+        buttons_layout = QHBoxLayout(buttons)
+        self.start_button = QPushButton("Export")
+        self.start_button.clicked.connect(self.start)
+        buttons_layout.addWidget(self.start_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel)
+        buttons_layout.addWidget(self.cancel_button)
+        layout.addRow(buttons)
+
+    def add_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Add PDF", "", "PDF Files (*.pdf)")
+        self.files.addItems(paths)
+
+    def browse(self):
+        out_dir = QFileDialog.getExistingDirectory(self, "Output Folder", self.out_dir.text())
+        if out_dir:
+            self.out_dir.setText(out_dir)
+
+    def start(self):
+        paths = [self.files.item(row).text() for row in range(self.files.count())]
+        if not paths:
+            return
+        try:
+            self.exporter.start(paths, self.pages.text().strip(), self.out_dir.text(), self.dpi.value(),
+                                self.colorspace.currentText(), self.format.currentText())
+        except (ValueError, RuntimeError, OSError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to start export: {str(e)}")
+            return
+        self.start_button.setEnabled(not self.exporter.running())
+
+    def on_progress(self, written, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(written)
+
+    def on_finished(self, error):
+        self.start_button.setEnabled(True)
+        if error:
+            QMessageBox.critical(self, "Error", f"Export failed for:\n{error}")
+            self.progress_bar.setFormat("%v / %m pages")
+        else:
+            self.progress_bar.setFormat("Done, %v pages")
+
+    def cancel(self):
+        if self.exporter.running():
+            self.exporter.cancel()
+            self.start_button.setEnabled(True)
+            self.progress_bar.setFormat("Cancelled at %v / %m")
+        else:
+            self.reject()
+
+    def closeEvent(self, event):
+        self.exporter.cancel()
+        super().closeEvent(event)
+
+class JsonFileStore:
+    # One JSON file per key. A SQLite table keyed the same way can replace it behind load/write
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None  # unreadable or corrupt: start from defaults rather than not at all
+
+    def write(self, key, text):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # A crash leaves either the old file or the new one, never a truncated one
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+# Changes are batched for this long before they are written
+STATE_SAVE_DELAY_MS = 1000
+# Where earlier versions kept them, relative to the working directory; read once if the config dir has none
+LEGACY_STATE_FILES = {"recent_files": "recent_files.json", "state": "state.json"}
+
+class StateStore(QObject):
+    write_failed = pyqtSignal(object)  # keys the writer could not save
+
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+        self.values = {}
+        self.dirty = set()
+        self.writes = 0
+        self.executor = ThreadPoolExecutor(max_workers=1)  # one writer keeps the writes in order
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.write_pending)
+        self.write_failed.connect(self.requeue)
+
+    def get(self, key, default=None):
+        if key not in self.values:
+            self.values[key] = self.backend.load(key)
+        value = self.values[key]
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.values[key] = value
+        self.dirty.add(key)
+        if not self.timer.isActive():
+            self.timer.start(STATE_SAVE_DELAY_MS)
+
+    def snapshot(self):
+        # Serialized on the GUI thread, so the writer never sees a dict that is being changed
+        with profiler.span("state_snapshot"):
+            batch = [(key, json.dumps(self.values[key])) for key in sorted(self.dirty)]
+        self.dirty.clear()
+        return batch
+
+    def write_batch(self, batch):
+        failed = []
+        with profiler.span("state_write"):
+            for key, text in batch:
+                try:
+                    self.backend.write(key, text)
+                except OSError:
+                    failed.append(key)
+        self.writes += 1
+        if failed:
+            self.write_failed.emit(failed)
+
+    def requeue(self, keys):
+        # Back on the GUI thread; written with the next change or the flush at exit, not retried in a loop
+        self.dirty.update(keys)
+
+    def write_pending(self):
+        if self.dirty:
+            self.executor.submit(self.write_batch, self.snapshot())
+
+    def flush(self):
+        self.timer.stop()
+        batch = self.snapshot()
+        self.executor.submit(lambda: None).result()  # wait for the writes already queued
+        self.write_batch(batch)
+
+# Open files are reloaded once they were quiet for this long; hashing runs in batches so renders interleave
+RELOAD_DELAY_MS = 500
+HASH_BATCH_PAGES = 64
+# A deleted file is polled this many times before the watcher waits for it to appear in its folder again
+RELOAD_MISSING_CHECKS = 20
+# Failed hash passes over one version before its pages all count as changed
+HASH_MAX_FAILURES = 3
+
+class DocumentWatcher(QObject):
+    changed = pyqtSignal(str, object)  # path, set of pages whose content changed, None for every page
+
+    def __init__(self, render_pool):
+        super().__init__()
+        self.render_pool = render_pool
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.hashes = {}  # path -> per-page content hashes of the version on screen, None until known
+        self.hashed_versions = {}  # path -> file version the hashes belong to
+        self.passes = {}  # path -> [version, page_count, hashes] of a hash pass in progress
+        self.versions = {}  # path -> version seen when the last change was reported
+        self.reloading = set()
+        self.timers = {}
+        self.missing_checks = {}  # path -> checks that found no file since it was last seen
+        self.missing = set()  # deleted files waited for through their folder
+        self.failures = {}  # path -> hash passes that failed since the last one that finished
+
+    def watch(self, path):
+        if path in self.hashes:
+            return
+        self.hashes[path] = None
+        self.watcher.addPath(path)
+        # After the first page is on screen; submitting now would start the workers ahead of it
+        QTimer.singleShot(RELOAD_DELAY_MS, lambda: self.start_baseline(path))
+
+    def start_baseline(self, path):
+        if path in self.hashes and self.hashes[path] is None and path not in self.passes and path not in self.reloading:
+            self.start_pass(path)
+
+    def unwatch(self, path):
+        self.hashes.pop(path, None)
+        self.hashed_versions.pop(path, None)
+        self.passes.pop(path, None)
+        self.versions.pop(path, None)
+        self.reloading.discard(path)
+        self.missing_checks.pop(path, None)
+        self.failures.pop(path, None)
+        timer = self.timers.pop(path, None)
+        if timer is not None:
+            timer.stop()
+            timer.deleteLater()
+        self.render_pool.cancel(("hashes", path))
+        self.watcher.removePath(path)
+        if path in self.missing:
+            self.missing.discard(path)
+            self.unwatch_directory(os.path.dirname(path))
+
+    def unwatch_directory(self, directory):
+        if not any(os.path.dirname(path) == directory for path in self.missing):
+            self.watcher.removePath(directory)
+
+    def on_directory_changed(self, directory):
+        for path in [path for path in self.missing if os.path.dirname(path) == directory and os.path.exists(path)]:
+            self.missing.discard(path)
+            self.watcher.addPath(path)
+            self.on_file_changed(path)
+        self.unwatch_directory(directory)
+
+    def on_file_changed(self, path):
+        if path not in self.hashes:
+            return
+        try:
+            version = file_version(path)
+        except OSError:
+            version = None
+        if version is not None and version == self.hashed_versions.get(path) and path not in self.reloading:
+            # Also reported when the replaced file's last handle is closed; nothing to reload
+            if path not in self.watcher.files():
+                self.watcher.addPath(path)
+            return
+        # A pass over a file that is being rewritten is worthless; start over once it is quiet
+        self.passes.pop(path, None)
+        self.render_pool.cancel(("hashes", path))
+        self.reloading.add(path)
+        self.versions[path] = version
+        timer = self.timers.get(path)
+        if timer is None:
+            timer = self.timers[path] = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda: self.check(path))
+        timer.start(RELOAD_DELAY_MS)
+
+    def check(self, path):
+        if path not in self.hashes:
+            return
+        try:
+            version = file_version(path)
+        except OSError:
+            version = None  # replaced by rename and the new file is not there yet
+        if version is None:
+            self.missing_checks[path] = self.missing_checks.get(path, 0) + 1
+            if self.missing_checks[path] >= RELOAD_MISSING_CHECKS:
+                # Deleted rather than replaced; its folder reports the file when it is back
+                del self.missing_checks[path]
+                self.missing.add(path)
+                self.watcher.addPath(os.path.dirname(path))
+                return
+        else:
+            self.missing_checks.pop(path, None)
+        if version is None or version != self.versions.get(path):
+            self.versions[path] = version
+            self.timers[path].start(RELOAD_DELAY_MS)
+            return
+        # A replaced file may still be watched by its old inode, which workers keep open; watch the current one
+        self.watcher.removePath(path)
+        self.watcher.addPath(path)
+        self.start_pass(path)
+
+    def start_pass(self, path):
+        try:
+            version = file_version(path)
+        except OSError:
+            return
+        self.passes[path] = [version, None, []]
+        self.hash_next(path)
+
+    def hash_next(self, path):
+        version, page_count, hashes = self.passes[path]
+        self.render_pool.submit(("hashes", path, len(hashes)), ("hashes", path),
+                                lambda result: self.on_hashes(path, version, result),
+                                page_hashes_in_worker, path, len(hashes), HASH_BATCH_PAGES)
+
+    def on_hashes(self, path, version, result):
+        entry = self.passes.get(path)
+        if entry is None or entry[0] != version:
+            return
+        worker_version, page_count, hashes = result
+        if worker_version != version:
+            self.on_file_changed(path)
+            return
+        entry[1] = page_count
+        entry[2].extend(hashes)
+        if len(entry[2]) < page_count:
+            self.hash_next(path)
+            return
+        del self.passes[path]
+        self.failures.pop(path, None)
+        old = self.hashes[path]
+        self.hashes[path] = entry[2]
+        self.hashed_versions[path] = version
+        if path in self.reloading:
+            self.reloading.discard(path)
+            new = entry[2]
+            if old is None:
+                changed = set(range(len(new)))
+            else:
+                changed = {page_num for page_num in range(max(len(old), len(new)))
+                           if page_num >= len(old) or page_num >= len(new) or old[page_num] != new[page_num]}
+            self.changed.emit(path, changed)
+
+    def on_hashes_failed(self, path):
+        if self.passes.pop(path, None) is None:
+            return
+        self.failures[path] = self.failures.get(path, 0) + 1
+        if self.failures[path] < HASH_MAX_FAILURES:
+            QTimer.singleShot(RELOAD_DELAY_MS, lambda: self.retry_pass(path))
+            return
+        # The version cannot be hashed; without hashes to compare against, the next change reloads every page too
+        del self.failures[path]
+        self.hashes[path] = None
+        self.hashed_versions.pop(path, None)
+        if path in self.reloading:
+            self.reloading.discard(path)
+            self.changed.emit(path, None)
+
+    def retry_pass(self, path):
+        timer = self.timers.get(path)
+        if timer is not None and timer.isActive():
+            return  # changed again meanwhile; check() starts the pass once it is quiet
+        if path in self.hashes and path not in self.passes and path not in self.missing:
+            self.start_pass(path)
+
+# Memory governor: raster budget across tabs, and how long a background document stays open
+MEMORY_BUDGET_BYTES = 768 * 1024 * 1024
+DOCUMENT_IDLE_SECONDS = 10 * 60
+GOVERNOR_INTERVAL_MS = 5000
+
+def process_rss_bytes():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None  # not Linux
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+class MemoryGovernor(QObject):
+    def __init__(self, reader, budget=MEMORY_BUDGET_BYTES):
+        super().__init__()
+        self.reader = reader
+        self.budget = budget
+        self.last_active = {}  # tab_id -> time.monotonic() when it was last the current tab
+        self.active = None
+        self.unloaded = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(GOVERNOR_INTERVAL_MS)
+
+    def touch(self, tab_id):
+        now = time.monotonic()
+        if self.active in self.last_active:
+            self.last_active[self.active] = now  # the tab being left was in use until now
+        self.active = tab_id
+        self.last_active[tab_id] = now
+
+    def forget(self, tab_id):
+        self.last_active.pop(tab_id, None)
+
+    def raster_bytes(self):
+        # The cache plus whatever the views hold that the cache already evicted
+        reader = self.reader
+        total = reader.render_cache.size
+        for tab_id in reader.view_modes:
+            canvas = reader.pdf_docs[f"{tab_id}_canvas"]
+            # Pixmaps are screen-format copies, never shared with the cache
+            if canvas.pixmap is not None:
+                total += pixmap_bytes(canvas.pixmap)
+            total += sum(pixmap_bytes(tile) for tile in canvas.tiles.values())
+            view = reader.pdf_docs.get(f"{tab_id}_continuous")
+            if view is not None:
+                for pixmaps in view.pages.values():
+                    total += sum(pixmap_bytes(pixmap) for pixmap in pixmaps.values())
+                total += sum(pixmap_bytes(preview) for preview in view.previews.values() if preview is not None)
+        return total
+
+    def usage(self):
+        reader = self.reader
+        return {
+            "budget": self.budget,
+            "rasters": self.raster_bytes(),
+            "raster_cache": reader.render_cache.size,
+            "mupdf_store": fitz.TOOLS.store_size(),  # None on PyMuPDF builds that do not report it
+            "process_rss": process_rss_bytes(),
+            "open_documents": len(reader.view_modes),
+            "unloaded_tabs": len(reader.pending_tabs),
+            "unloaded_total": self.unloaded,
+        }
+
+    def check(self):
+        reader = self.reader
+        current = reader.get_tab_id(reader.notebook.currentIndex())
+        if current:
+            self.touch(current)
+        now = time.monotonic()
+        for tab_id in reader.view_modes:
+            self.last_active.setdefault(tab_id, now)  # opened without being shown
+        background = sorted((tab_id for tab_id in reader.view_modes if tab_id != current),
+                            key=lambda tab_id: self.last_active[tab_id])
+        for tab_id in [t for t in background if now - self.last_active[t] > DOCUMENT_IDLE_SECONDS]:
+            self.unload(tab_id)
+            background.remove(tab_id)
+        if self.raster_bytes() <= self.budget:
+            return
+        # Cheapest first: background pixels, then MuPDF's cached resources, then whole documents
+        for tab_id in background:
+            reader.drop_rasters(tab_id)
+        fitz.TOOLS.store_shrink(50)
+        if reader.render_cache.size > self.budget // 2:
+            reader.render_cache.evict(self.budget // 2)
+        while background and self.raster_bytes() > self.budget:
+            self.unload(background.pop(0))
+
+    def unload(self, tab_id):
+        self.reader.unload_tab(tab_id)
+        self.unloaded += 1
+        fitz.TOOLS.store_shrink(100 if not self.reader.view_modes else 50)
+
+# Single instance: later launches hand their files to the running window over a per-user local socket
+INSTANCE_NAME = "PDFReader-" + hashlib.sha1(os.path.expanduser("~").encode("utf-8")).hexdigest()[:12]
+INSTANCE_TIMEOUT_MS = 500
+
+def forward_to_instance(files, name=INSTANCE_NAME):
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if not socket.waitForConnected(INSTANCE_TIMEOUT_MS):
+        return False
+    socket.write(json.dumps({"files": files}).encode("utf-8") + b"\n")
+    socket.waitForBytesWritten(INSTANCE_TIMEOUT_MS)
+    socket.disconnectFromServer()
+    return True
+
+class InstanceServer(QObject):
+    files_received = pyqtSignal(list)
+
+    def __init__(self, name=INSTANCE_NAME):
+        super().__init__()
+        self.name = name
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.on_connection)
+        self.buffers = {}
+
+    def listen(self, files=()):
+        if self.server.listen(self.name):
+            return True
+        # The name is taken: either another instance won a launch race, or a crashed one left its socket
+        if forward_to_instance(list(files), self.name):
+            return False
+        QLocalServer.removeServer(self.name)
+        return self.server.listen(self.name)
+
+    def on_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b""
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.on_disconnected(socket))
+
+    def on_ready_read(self, socket):
+        self.buffers[socket] += bytes(socket.readAll())
+        if b"\n" in self.buffers[socket]:
+            self.on_disconnected(socket)
+
+    def on_disconnected(self, socket):
+        data = self.buffers.pop(socket, None)
+        socket.deleteLater()
+        if not data:
+            return
+        try:
+            files = json.loads(data.split(b"\n", 1)[0].decode("utf-8"))["files"]
+        except (ValueError, KeyError):
+            return
+        self.files_received.emit([path for path in files if isinstance(path, str)])
+
+# Refresh interval of the performance overlay, and the bars its histograms are drawn with
+PERF_OVERLAY_MS = 500
+HISTOGRAM_BARS = " ▁▂▃▄▅▆▇█"
+
+# Larger files are parsed in a worker before the GUI opens them, since a broken xref
+# can take seconds to rebuild
+OPEN_INLINE_MAX_BYTES = 64 * 2**20
+
+# Per-document state kept for files that are no longer open
+MAX_REMEMBERED_DOCUMENTS = 100
+
 class PDFReader(QMainWindow):
-    def __init__(self):
+    def __init__(self, files=()):
         super().__init__()
         self.setWindowTitle("PDF Reader")
         self.setGeometry(100, 100, 900, 700)
         self.pdf_docs = {}
+        self.doc_paths = {}  # tab_id -> file a loaded tab shows; its document may be opened from a repaired copy
         self.current_pages = {}
         self.zoom_levels = {}
+        self.render_modes = {}
+        self.render_cache = RenderCache()
+        self.render_pool = RenderPool()
+        self.render_pool.rendered.connect(self.on_page_rendered)
+        self.render_pool.failed.connect(self.on_render_failed)
+        self.render_pool.thumbnail_rendered.connect(self.on_thumbnail_rendered)
+        self.render_targets = {}
+        self.view_modes = {}
+        self.page_geometry = {}  # tab_id -> {page_num: page.rect}
+        self.text_indexer = TextIndexer()
+        self.text_indexer.progress.connect(self.on_index_progress)
+        self.search_results = {}  # tab_id -> (query, matches, position)
+        self.hit_indexes = OrderedDict()  # ("hits", path, page_num) -> PageHitIndex, shared by tabs of one file
+        self.selections = {}  # tab_id -> (page_num, anchor word, end word)
         self.tab_count = 0
+        self.pending_tabs = {}  # tab_id -> saved state of a tab whose document is not opened yet
+        self.opening = {}  # tab_id -> path being parsed by a worker
+        self.open_errors = {}  # tab_id -> why the document could not be opened
+        self.pending_scroll = {}  # tab_id -> scroll position to apply after the first render
+        self.documents = {}  # abspath -> last page, zoom and scroll of the document
+        self.stale_pages = {}  # path -> pages changed on disk that the open tabs do not show yet
+        self.repairs = {}  # ("repair", tab_id or path) -> what to do once the repaired copy is saved or not
+        self.restoring = False
+        self.unrastered = set()  # loaded tabs whose rasters the memory governor dropped
+        self.memory_governor = MemoryGovernor(self)
+        self.document_watcher = DocumentWatcher(self.render_pool)
+        self.document_watcher.changed.connect(self.reload_document)
+        self.store = StateStore(JsonFileStore(CONFIG_DIR))
         self.recent_files = []
-        self.from_slide = False
         self.zoom_mode = None
         self.setup_ui()
+        self.migrate_legacy_state()
         self.load_recent_files()  # Dosyadan recent_files'i yükle
         self.update_recent_menu()  # Menüyü güncelle
         self.load_state()
+        cache_mb = self.store.get("settings", {}).get("render_cache_mb", RENDER_CACHE_BYTES // 2**20)
+        self.render_cache.set_max_bytes(cache_mb * 2**20)
         self.setStyleSheet(STYLESHEET)
         self.setAcceptDrops(True)
+        # Documents open once the event loop runs, so the window is on screen first
+        QTimer.singleShot(0, lambda: self.open_startup(files))
+        QTimer.singleShot(CACHE_PRUNE_DELAY_MS, self.prune_caches)
+
+    def open_startup(self, files):
+        files = [path for path in files if os.path.isfile(path)]
+        if files:
+            self.open_files(files)
+        else:
+            self.on_tab_changed(self.notebook.currentIndex())
+
+    def open_files(self, files):
+        for path in files:
+            self.add_pdf_tab(path)
+
+    def open_forwarded(self, files):
+        # Files from a second launch; bring this window to the front as that launch would have
+        self.open_files([path for path in files if os.path.isfile(path)])
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
 
     def setup_ui(self):
         # Menu Bar
@@ -204,8 +2225,23 @@ class PDFReader(QMainWindow):
         close_tab_action = QAction("Close Tab", self)
         close_tab_action.setShortcut("Ctrl+W")  # Kısayol ataması (opsiyonel)
         close_tab_action.triggered.connect(self.close_tab)  # Fonksiyon bağlantısı
+        export_action = QAction("Batch Export...", self)
+        export_action.triggered.connect(self.batch_export)
+        file_menu.addAction(export_action)
         file_menu.addSeparator()  # Ayrı çizgi ekle
         file_menu.addAction(close_tab_action)
+        view_menu = menubar.addMenu("View")
+        self.overlay_action = QAction("Performance Overlay (Ctrl+Shift+P)", self)
+        self.overlay_action.setShortcut("Ctrl+Shift+P")
+        self.overlay_action.setCheckable(True)
+        self.overlay_action.toggled.connect(self.toggle_perf_overlay)
+        view_menu.addAction(self.overlay_action)
+        cache_action = QAction("Render Cache Size...", self)
+        cache_action.triggered.connect(self.set_cache_size)
+        view_menu.addAction(cache_action)
+        trace_action = QAction("Export Trace...", self)
+        trace_action.triggered.connect(self.export_trace)
+        view_menu.addAction(trace_action)
 
         # Main Widget
         self.central_widget = QWidget()
@@ -216,8 +2252,18 @@ class PDFReader(QMainWindow):
         self.notebook = QTabWidget()
         self.notebook.setTabsClosable(True)
         self.notebook.tabCloseRequested.connect(self.close_tab)
+        self.notebook.currentChanged.connect(self.on_tab_changed)
         self.main_layout.addWidget(self.notebook)
 
+        # Performance overlay, floats over the page area
+        self.perf_overlay = QLabel(self.notebook)
+        self.perf_overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.perf_overlay.setStyleSheet("background-color: rgba(0, 0, 0, 170); color: #E0E0E0; "
+                                        "font-family: monospace; padding: 6px;")
+        self.perf_overlay.hide()
+        self.perf_timer = QTimer(self)
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+
         # Status Bar
         status_label = QLabel("Drag and drop PDF files here")
         status_label.setAlignment(Qt.AlignCenter)
@@ -228,112 +2274,305 @@ class PDFReader(QMainWindow):
         self.shortcut_prev = QShortcut("PgUp", self, activated=self.prev_page)
         self.shortcut_next = QShortcut("PgDown", self, activated=self.next_page)
         self.shortcut_switch = QShortcut("Ctrl+Tab", self, activated=self.switch_tab)
+        self.shortcut_search = QShortcut("Ctrl+F", self, activated=self.focus_search)
+        self.shortcut_copy = QShortcut("Ctrl+C", self, activated=self.copy_selection)
 
-    def add_pdf_tab(self, file_path):
-        # try:
-        if True:
-            pdf_doc = fitz.open(file_path)
-            tab_id = f"tab_{self.tab_count}"
-            self.tab_count += 1
-            self.pdf_docs[tab_id] = pdf_doc
-            self.current_pages[tab_id] = 0
-            self.zoom_levels[tab_id] = 1.0
+    def add_pdf_tab(self, file_path, state=None, activate=True):
+        # The tab starts as an empty placeholder; the document is opened when the tab is first shown
+        file_path = os.path.abspath(file_path)  # Mutlak yol garantisi
+        tab_id = f"tab_{self.tab_count}"
+        self.tab_count += 1
+        if state is None:
+            state = self.documents.get(file_path, {})
+        self.pending_tabs[tab_id] = dict(state, path=file_path)
+        tab_widget = QWidget()
+        tab_widget.setProperty("tab_id", tab_id)  # Özel özellik olarak tab_id'yi kaydet
+        self.pdf_docs[f"{tab_id}_tab"] = tab_widget
+        self.notebook.addTab(tab_widget, os.path.basename(file_path))
+        if activate:
+            self.notebook.setCurrentWidget(tab_widget)
+            self.load_tab(tab_id)
 
-            # Tab Widget
-            tab_widget = QWidget()
-            tab_widget.setProperty("tab_id", tab_id)  # Özel özellik olarak tab_id'yi kaydet
+        if file_path not in self.recent_files:
+            self.recent_files.insert(0, file_path)
+            self.recent_files = self.recent_files[:10]  # En fazla 10 dosya
+            self.save_recent_files()
+            self.update_recent_menu()
+        return tab_id
+
+    def on_tab_changed(self, index):
+        tab_id = self.get_tab_id(index)
+        if self.restoring or not tab_id:
+            return
+        self.memory_governor.touch(tab_id)
+        if tab_id in self.pending_tabs:
+            self.load_tab(tab_id)
+        elif tab_id in self.unrastered:
+            self.unrastered.discard(tab_id)
+            self.schedule_render(tab_id, force=True)
+            if self.view_modes[tab_id] == "continuous":
+                self.pdf_docs[f"{tab_id}_continuous"].update_visible()
+
+    def load_tab(self, tab_id, probed=False):
+        state = self.pending_tabs.get(tab_id)
+        if state is None or tab_id in self.opening or tab_id in self.open_errors:
+            return
+        file_path = state["path"]
+        try:
+            size = os.path.getsize(file_path)
+            if not probed and size > OPEN_INLINE_MAX_BYTES and not os.path.exists(repaired_path(file_path)):
+                # A worker parses the file first; the tab shows progress instead of freezing the window
+                self.opening[tab_id] = file_path
+                self.show_tab_message(tab_id, f"Opening {os.path.basename(file_path)} ({size / 2**20:.0f} MB)…")
+                self.render_pool.submit(("open", tab_id), ("open", tab_id),
+                                        lambda info: self.on_document_probed(tab_id, info), probe_in_worker, file_path)
+                return
+            with profiler.span("open"):
+                pdf_doc = open_document(file_path)
+        except Exception as e:
+            self.show_open_error(tab_id, str(e))
+            return
+        startup_mark("document_opened")
+        del self.pending_tabs[tab_id]
+        self.hide_tab_message(tab_id)
+        self.pdf_docs[tab_id] = pdf_doc
+        self.doc_paths[tab_id] = file_path
+        self.set_document_tooltip(tab_id, pdf_doc.metadata, pdf_doc.page_count)
+        self.current_pages[tab_id] = min(max(state.get("page", 0), 0), pdf_doc.page_count - 1)
+        self.zoom_levels[tab_id] = state.get("zoom", 1.0)
+        self.render_modes[tab_id] = state.get("render_mode") if state.get("render_mode") in RENDER_MODES else "color"
+        self.view_modes[tab_id] = "single"
+        self.page_geometry[tab_id] = {}
+        if state.get("scroll"):
+            self.pending_scroll[tab_id] = tuple(state["scroll"])
+
+        # Tab Widget
+        tab_widget = self.pdf_docs[f"{tab_id}_tab"]
+        tab_layout = tab_widget.layout()  # kept when the tab was unloaded
+        if tab_layout is None:
             tab_layout = QVBoxLayout(tab_widget)
-            canvas_frame = QWidget()
-            canvas_layout = QHBoxLayout(canvas_frame)
-            canvas = PDFCanvas(canvas_frame, tab_id, self)
-            canvas.setStyleSheet(f"background-color: {colors['canvas_bg']};")
-            canvas_layout.addWidget(canvas)
-            scroll_area = QScrollArea()
-            scroll_area.setWidget(canvas)
-            scroll_area.setWidgetResizable(True)
-            tab_layout.addWidget(scroll_area)
-
-            # Overlay Frame
-            overlay_frame = QWidget()
-            overlay_layout = QHBoxLayout(overlay_frame)
-            border_frame = QWidget()
-            border_frame.setStyleSheet("border: 2px solid black;")
-            border_layout = QHBoxLayout(border_frame)
-
-            self.page_var = QLineEdit()
-            self.page_var.setFixedWidth(40)
-            self.page_var.setAlignment(Qt.AlignCenter)
-            self.page_var.returnPressed.connect(lambda: self.go_to_page(tab_id))
-            border_layout.addWidget(self.page_var)
-
-            max_page_label = QLabel(f"/ {pdf_doc.page_count}")
-            border_layout.addWidget(max_page_label)
-
-            prev_button = QPushButton("⏮")
-            prev_button.clicked.connect(self.prev_page)
-            border_layout.addWidget(prev_button)
-            next_button = QPushButton("⏭")
-            next_button.clicked.connect(self.next_page)
-            border_layout.addWidget(next_button)
-
-            zoom_buttons = [
-                ("⤡", lambda: self.fit_width(tab_id), "Fit Width (Genişliğe Sığdır)"),
-                ("⤢", lambda: self.fit_height(tab_id), "Fit Height (Yüksekliğe Sığdır)"),
-                ("⧉", lambda: self.setup_zoom_rectangle(tab_id), "Area Zoom (Alan Büyütme)"),
-                ("⟲", lambda: self.zoom_reset(tab_id), "Reset Zoom (Varsayılan Boyut)")
-            ]
-            for icon, cmd, tip in zoom_buttons:
-                btn = QPushButton(icon)
-                btn.setFixedWidth(30)
-                btn.clicked.connect(cmd)
-                btn.setToolTip(tip)
-                if icon == "⟲":
-                    btn.setObjectName("resetButton")
-                border_layout.addWidget(btn)
-
-            zoom_out_button = QPushButton("➖")
-            zoom_out_button.clicked.connect(lambda: self.zoom_out(tab_id))
-            border_layout.addWidget(zoom_out_button)
-            zoom_slider = QSlider(Qt.Horizontal)
-            zoom_slider.setRange(10, 200)
-            zoom_slider.setValue(100)
-            zoom_slider.setFixedWidth(150)  # Sabit genişlik (örneğin 150 piksel)
-            zoom_slider.valueChanged.connect(lambda v: self.on_zoom_slide(v, tab_id))
-            border_layout.addWidget(zoom_slider)
-            zoom_in_button = QPushButton("➕")
-            zoom_in_button.clicked.connect(lambda: self.zoom_in(tab_id))
-            border_layout.addWidget(zoom_in_button)
-
-            self.zoom_label_var = QLabel("100%")
-            self.zoom_label_var.setObjectName("zoomInfo")
-            border_layout.addWidget(self.zoom_label_var)
-
-            overlay_layout.addWidget(border_frame)
-            # overlay_frame.hide()
-            tab_layout.addWidget(overlay_frame)
-
-            self.notebook.addTab(tab_widget, os.path.basename(file_path))
-            self.notebook.setCurrentWidget(tab_widget)
+        canvas_frame = QWidget()
+        canvas_layout = QHBoxLayout(canvas_frame)
+        canvas = PDFCanvas(canvas_frame, tab_id, self)
+        canvas.setStyleSheet(f"background-color: {colors['canvas_bg']};")
+        canvas_layout.addWidget(canvas)
+        scroll_area = QScrollArea()
+        scroll_area.setWidget(canvas)
+        scroll_area.setWidgetResizable(True)
+        scroll_area.horizontalScrollBar().valueChanged.connect(lambda: self.request_tiles(tab_id))
+        scroll_area.verticalScrollBar().valueChanged.connect(lambda: self.request_tiles(tab_id))
+        view_frame = QWidget()
+        view_layout = QHBoxLayout(view_frame)
+        view_layout.setContentsMargins(0, 0, 0, 0)
+        thumbnails = ThumbnailBar(view_frame, tab_id, self, pdf_doc)
+        view_layout.addWidget(thumbnails)
+        view_layout.addWidget(scroll_area)
+        tab_layout.addWidget(view_frame)
+
+        # Store references
+        self.pdf_docs[f"{tab_id}_canvas"] = canvas
+        self.pdf_docs[f"{tab_id}_scroll"] = scroll_area
+        self.pdf_docs[f"{tab_id}_thumbnails"] = thumbnails
+
+        scheduler = RenderScheduler(
+            lambda: self.render_page(tab_id),
+            lambda: (self.current_pages[tab_id], self.zoom_levels[tab_id], self.render_modes[tab_id],
+                     canvas.devicePixelRatioF(), canvas.width(), canvas.height()))
+        self.pdf_docs[f"{tab_id}_scheduler"] = scheduler
+        canvas.resizeEvent = lambda e: scheduler.schedule()
+        if state.get("view_mode") == "continuous":
+            self.toggle_continuous(tab_id)
+        scheduler.schedule()
+        QTimer.singleShot(0, lambda: self.build_toolbar(tab_id))
+        self.text_indexer.index(file_path, pdf_doc.page_count)
+        self.document_watcher.watch(file_path)
+
+    def on_document_probed(self, tab_id, info):
+        if tab_id not in self.opening:
+            return
+        now = time.perf_counter()
+        profiler.record("open_parse", now - info["seconds"], now)
+        self.set_document_tooltip(tab_id, info["metadata"], info["page_count"])
+        self.show_tab_message(tab_id, f"{info['page_count']} pages" + (", repairing…" if info["repaired"] else ""))
+
+        def open_probed():
+            if self.opening.pop(tab_id, None) is not None:
+                # Let the message paint before the GUI opens its own handle
+                QTimer.singleShot(0, lambda: self.load_tab(tab_id, probed=True))
+        self.after_repair(("repair", tab_id), self.pending_tabs[tab_id]["path"], info, open_probed)
+
+    def after_repair(self, key, path, info, then):
+        # A file MuPDF had to repair is saved repaired by a worker before the GUI opens it, so the GUI
+        # opens the copy instead of rebuilding the xref itself
+        if not info["repaired"]:
+            then()
+            return
+        self.repairs[key] = then
+        self.render_pool.submit(key, key, lambda saved: self.repairs.pop(key)(), repair_in_worker, path)
+
+    def set_document_tooltip(self, tab_id, metadata, page_count):
+        tab_widget = self.pdf_docs.get(f"{tab_id}_tab")
+        if tab_widget is None:
+            return
+        lines = [self.pending_tabs[tab_id]["path"] if tab_id in self.pending_tabs else self.doc_paths[tab_id]]
+        for label, field in (("Title", "title"), ("Author", "author")):
+            if (metadata or {}).get(field):
+                lines.append(f"{label}: {metadata[field]}")
+        lines.append(f"{page_count} pages")
+        self.notebook.setTabToolTip(self.notebook.indexOf(tab_widget), "\n".join(lines))
+
+    def show_tab_message(self, tab_id, text, retry=False):
+        # Progress and open errors are shown in the tab itself, where the page will be
+        tab_widget = self.pdf_docs[f"{tab_id}_tab"]
+        label = self.pdf_docs.get(f"{tab_id}_message")
+        if label is None:
+            tab_layout = tab_widget.layout()
+            if tab_layout is None:
+                tab_layout = QVBoxLayout(tab_widget)
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            label.setWordWrap(True)
+            label.setStyleSheet(f"color: {colors['info']};")
+            retry_button = QPushButton("⟳")
+            retry_button.setFixedWidth(30)
+            retry_button.setToolTip("Retry (Tekrar Dene)")
+            retry_button.clicked.connect(lambda: self.retry_open(tab_id))
+            tab_layout.addWidget(label)
+            tab_layout.addWidget(retry_button, alignment=Qt.AlignHCenter | Qt.AlignTop)
+            self.pdf_docs[f"{tab_id}_message"] = label
+            self.pdf_docs[f"{tab_id}_retry"] = retry_button
+        label.setText(text)
+        self.pdf_docs[f"{tab_id}_retry"].setVisible(retry)
+
+    def hide_tab_message(self, tab_id):
+        for name in ("message", "retry"):
+            widget = self.pdf_docs.pop(f"{tab_id}_{name}", None)
+            if widget is not None:
+                widget.deleteLater()
+
+    def show_open_error(self, tab_id, message):
+        if tab_id not in self.pending_tabs:
+            return
+        self.open_errors[tab_id] = message
+        self.show_tab_message(tab_id, f"Failed to open {os.path.basename(self.pending_tabs[tab_id]['path'])}:\n{message}",
+                              retry=True)
+
+    def retry_open(self, tab_id):
+        self.open_errors.pop(tab_id, None)
+        self.load_tab(tab_id)
+
+    def build_toolbar(self, tab_id):
+        # Built after the first frame of the tab is scheduled; nothing on the way to the page waits for it
+        if tab_id not in self.view_modes or f"{tab_id}_overlay" in self.pdf_docs:
+            return
+        pdf_doc = self.pdf_docs[tab_id]
+        tab_layout = self.pdf_docs[f"{tab_id}_tab"].layout()
 
-            # Store references
-            self.pdf_docs[f"{tab_id}_canvas"] = canvas
-            self.pdf_docs[f"{tab_id}_overlay"] = overlay_frame
-            self.pdf_docs[f"{tab_id}_slider"] = zoom_slider
-            self.pdf_docs[f"{tab_id}_page_var"] = self.page_var
-            self.pdf_docs[f"{tab_id}_max_label"] = max_page_label
+        # Overlay Frame
+        overlay_frame = QWidget()
+        overlay_layout = QHBoxLayout(overlay_frame)
+        border_frame = QWidget()
+        border_frame.setStyleSheet("border: 2px solid black;")
+        border_layout = QHBoxLayout(border_frame)
 
-            canvas.resizeEvent = lambda e: QTimer.singleShot(200, lambda: self.render_page(tab_id))
-            self.render_page(tab_id)
+        page_var = QLineEdit()
+        page_var.setFixedWidth(40)
+        page_var.setAlignment(Qt.AlignCenter)
+        page_var.returnPressed.connect(lambda: self.go_to_page(tab_id))
+        border_layout.addWidget(page_var)
 
-            file_path = os.path.abspath(file_path)  # Mutlak yol garantisi
-            if file_path not in self.recent_files:
-                self.recent_files.insert(0, file_path)
-                self.recent_files = self.recent_files[:10]  # En fazla 10 dosya
-                self.save_recent_files()
-                self.update_recent_menu()
+        max_page_label = QLabel(f"/ {pdf_doc.page_count}")
+        border_layout.addWidget(max_page_label)
 
-        # except Exception as e:
-        #     QMessageBox.critical(self, "Error", f"Failed to open PDF: {str(e)}")
+        prev_button = QPushButton("⏮")
+        prev_button.clicked.connect(self.prev_page)
+        border_layout.addWidget(prev_button)
+        next_button = QPushButton("⏭")
+        next_button.clicked.connect(self.next_page)
+        border_layout.addWidget(next_button)
+        continuous_button = QPushButton("☰")
+        continuous_button.setFixedWidth(30)
+        continuous_button.setToolTip("Continuous Scroll (Sürekli Kaydırma)")
+        continuous_button.clicked.connect(lambda: self.toggle_continuous(tab_id))
+        border_layout.addWidget(continuous_button)
+        thumbnails_button = QPushButton("▤")
+        thumbnails_button.setFixedWidth(30)
+        thumbnails_button.setToolTip("Thumbnails (Küçük Resimler)")
+        thumbnails_button.clicked.connect(lambda: self.toggle_thumbnails(tab_id))
+        border_layout.addWidget(thumbnails_button)
+        mode_box = QComboBox()
+        for mode, label in RENDER_MODES.items():
+            mode_box.addItem(label, mode)
+        mode_box.setCurrentIndex(list(RENDER_MODES).index(self.render_modes[tab_id]))
+        mode_box.setToolTip("Render Mode (Görüntü Modu)")
+        mode_box.currentIndexChanged.connect(lambda index: self.set_render_mode(tab_id, mode_box.itemData(index)))
+        border_layout.addWidget(mode_box)
+
+        search_var = QLineEdit()
+        search_var.setPlaceholderText("Search")
+        search_var.setFixedWidth(140)
+        search_var.returnPressed.connect(lambda: self.search(tab_id))
+        border_layout.addWidget(search_var)
+        search_label = QLabel("")
+        border_layout.addWidget(search_label)
+
+        zoom_buttons = [
+            ("⤡", lambda: self.fit_width(tab_id), "Fit Width (Genişliğe Sığdır)"),
+            ("⤢", lambda: self.fit_height(tab_id), "Fit Height (Yüksekliğe Sığdır)"),
+            ("⧉", lambda: self.setup_zoom_rectangle(tab_id), "Area Zoom (Alan Büyütme)"),
+            ("⟲", lambda: self.zoom_reset(tab_id), "Reset Zoom (Varsayılan Boyut)")
+        ]
+        for icon, cmd, tip in zoom_buttons:
+            btn = QPushButton(icon)
+            btn.setFixedWidth(30)
+            btn.clicked.connect(cmd)
+            btn.setToolTip(tip)
+            if icon == "⟲":
+                btn.setObjectName("resetButton")
+            border_layout.addWidget(btn)
+
+        zoom_out_button = QPushButton("➖")
+        zoom_out_button.clicked.connect(lambda: self.zoom_out(tab_id))
+        border_layout.addWidget(zoom_out_button)
+        zoom_slider = QSlider(Qt.Horizontal)
+        zoom_slider.setRange(10, 200)
+        zoom_slider.setValue(100)
+        zoom_slider.setFixedWidth(150)  # Sabit genişlik (örneğin 150 piksel)
+        zoom_slider.valueChanged.connect(lambda v: self.on_zoom_slide(v, tab_id))
+        border_layout.addWidget(zoom_slider)
+        zoom_in_button = QPushButton("➕")
+        zoom_in_button.clicked.connect(lambda: self.zoom_in(tab_id))
+        border_layout.addWidget(zoom_in_button)
+
+        zoom_label = QLabel("100%")
+        zoom_label.setObjectName("zoomInfo")
+        border_layout.addWidget(zoom_label)
+
+        overlay_layout.addWidget(border_frame)
+        # overlay_frame.hide()
+        tab_layout.addWidget(overlay_frame)
+
+        self.pdf_docs[f"{tab_id}_overlay"] = overlay_frame
+        self.pdf_docs[f"{tab_id}_slider"] = zoom_slider
+        self.pdf_docs[f"{tab_id}_page_var"] = page_var
+        self.pdf_docs[f"{tab_id}_zoom_label"] = zoom_label
+        self.pdf_docs[f"{tab_id}_max_label"] = max_page_label
+        self.pdf_docs[f"{tab_id}_search_var"] = search_var
+        self.pdf_docs[f"{tab_id}_search_label"] = search_label
+        self.update_page_controls(tab_id)
+        self.update_search_label(tab_id)
+
+    def set_render_mode(self, tab_id, mode):
+        if tab_id not in self.render_modes or self.render_modes[tab_id] == mode:
+            return
+        self.render_modes[tab_id] = mode
+        self.render_pool.cancel(tab_id)
+        self.schedule_render(tab_id, force=True)
+        self.save_state()
+
+    def toggle_thumbnails(self, tab_id):
+        thumbnails = self.pdf_docs[f"{tab_id}_thumbnails"]
+        thumbnails.setVisible(not thumbnails.isVisible())
 
     # def show_overlay(self, tab_id):
     #     overlay = self.pdf_docs.get(f"{tab_id}_overlay")
@@ -345,6 +2584,11 @@ class PDFReader(QMainWindow):
     #     if overlay:
     #         overlay.hide()
 
+    def schedule_render(self, tab_id, force=False):
+        scheduler = self.pdf_docs.get(f"{tab_id}_scheduler")
+        if scheduler:
+            scheduler.schedule(force)
+
     def render_page(self, tab_id):
         if tab_id not in self.pdf_docs:
             return
@@ -353,56 +2597,585 @@ class PDFReader(QMainWindow):
         if page_num < 0 or page_num >= pdf_doc.page_count:
             return
 
+        canvas = self.pdf_docs[f"{tab_id}_canvas"]
+        zoom = self.zoom_levels[tab_id]
+        rotation = 0  # pages are shown upright; the rotation field of the cache key stays 0
+        mode = self.render_modes[tab_id]
+        # Rasters are rendered at the screen's resolution and drawn at the logical page size
+        dpr = canvas.devicePixelRatioF()
+        scale = zoom * dpr
+        path = self.doc_paths[tab_id]
+        key = RenderCache.key(path, page_num, scale, rotation, None, mode)
+        self.render_targets[tab_id] = key
+        if self.view_modes[tab_id] == "continuous":
+            view = self.pdf_docs[f"{tab_id}_continuous"]
+            view.set_view(zoom, rotation, dpr, mode)
+            view.show_page(page_num)
+            self.update_page_controls(tab_id)
+            if tab_id in self.pending_scroll:
+                self.restore_scroll(tab_id)
+            return
+        with profiler.span("render_page.layout"):
+            page_rect = self.page_rect(tab_id, page_num)
+            size = (page_rect * fitz.Matrix(zoom, zoom).prerotate(rotation)).irect
+            raster = (page_rect * fitz.Matrix(scale, scale).prerotate(rotation)).irect
+            canvas.page_rect = page_rect
+            canvas.zoom = zoom
+            canvas.dpr = dpr
+            canvas.rotation = rotation
+            canvas.page_size = (size.width, size.height)
+            canvas.raster_size = (raster.width, raster.height)
+            canvas.setMinimumSize(size.width, size.height)
+            canvas.tiles = {}
+            canvas.tiled = raster.width * raster.height > TILED_MIN_PIXELS
+        with profiler.span("render_page.cache"):
+            qimage = None if canvas.tiled else self.render_cache.get(key)
+            if qimage is None and not canvas.tiled and not self.render_pool.spawned:
+                # Workers take a few hundred ms to spawn; the very first page is rendered here instead
+                pix = qimage_compatible(pdf_doc.load_page(page_num).get_pixmap(
+                    matrix=fitz.Matrix(scale, scale).prerotate(rotation),
+                    colorspace=fitz.csRGB if mode == "color" else fitz.csGRAY))
+                qimage = samples_to_qimage(*mono_samples(pix)) if mode == "mono" else pixmap_to_qimage(pix)
+                self.render_cache.put(key, qimage)
+            if qimage is not None:
+                self.show_image(tab_id, qimage, key)
+            else:
+                # Keep showing this page at another zoom, scaled, until the new raster is ready
+                same_page = (canvas.image_key and canvas.image_key[:2] == key[:2]
+                             and canvas.image_key[3] == key[3] and canvas.image_key[5] == key[5])
+                if not same_page:
+                    canvas.set_image(*(self.render_cache.closest(key) or (None, None)))
+                canvas.update()
+        with profiler.span("render_page.requests"):
+            if canvas.tiled:
+                # Never rasterize the whole page at this zoom, only what the viewport shows
+                self.request_tiles(tab_id)
+            else:
+                if qimage is None:
+                    self.render_pool.request(key, tab_id, path, page_num, scale, rotation, None, mode)
+
+                # Prefetch the neighbours of the active tab so page turns hit the cache
+                wanted = {key}
+                if tab_id == self.get_tab_id(self.notebook.currentIndex()):
+                    for offset in (1, -1, 2, -2):
+                        neighbour = page_num + offset
+                        if 0 <= neighbour < pdf_doc.page_count:
+                            neighbour_key = RenderCache.key(path, neighbour, scale, rotation, None, mode)
+                            wanted.add(neighbour_key)
+                            if neighbour_key not in self.render_cache:
+                                self.render_pool.request(neighbour_key, tab_id, path, neighbour, scale,
+                                                         rotation, None, mode)
+                self.render_pool.cancel(tab_id, keep=wanted)
+            # Links and words of the shown page, ready before the pointer gets there
+            self.hit_index(tab_id, page_num)
+
+        self.update_page_controls(tab_id)
+        if tab_id in self.pending_scroll:
+            # The scroll area picks up the new canvas size on its next layout pass
+            QTimer.singleShot(0, lambda: self.restore_scroll(tab_id))
+
+    def restore_scroll(self, tab_id):
+        position = self.pending_scroll.pop(tab_id, None)
+        if position is None or tab_id not in self.view_modes:
+            return
+        horizontal, vertical = self.scroll_bars(tab_id)
+        horizontal.setValue(position[0])
+        vertical.setValue(position[1])
+
+    def scroll_bars(self, tab_id):
+        if self.view_modes[tab_id] == "continuous":
+            area = self.pdf_docs[f"{tab_id}_continuous"]
+        else:
+            area = self.pdf_docs[f"{tab_id}_scroll"]
+        return area.horizontalScrollBar(), area.verticalScrollBar()
+
+    def page_rect(self, tab_id, page_num):
+        geometry = self.page_geometry[tab_id]
+        rect = geometry.get(page_num)
+        if rect is None:
+            rect = geometry[page_num] = self.pdf_docs[tab_id].load_page(page_num).rect
+        return rect
+
+    def update_page_controls(self, tab_id):
+        pdf_doc = self.pdf_docs[tab_id]
+        page_num = self.current_pages[tab_id]
+        zoom = self.zoom_levels[tab_id]
+        self.pdf_docs[f"{tab_id}_thumbnails"].show_page(page_num)
+        self.notebook.setTabText(self.notebook.indexOf(self.pdf_docs[f"{tab_id}_tab"]),
+                                 f"{os.path.basename(self.doc_paths[tab_id])} - Page {page_num+1}/{pdf_doc.page_count}")
+        if f"{tab_id}_overlay" not in self.pdf_docs:
+            return  # toolbar not built yet, it syncs itself once it is
         self.pdf_docs[f"{tab_id}_page_var"].setText(str(page_num + 1))
         self.pdf_docs[f"{tab_id}_max_label"].setText(f"/ {pdf_doc.page_count}")
 
-        canvas = self.pdf_docs[f"{tab_id}_canvas"]
-        zoom = self.zoom_levels[tab_id]
-        page = pdf_doc.load_page(page_num)
-        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
-        img = Image.open(io.BytesIO(pix.tobytes()))
-        
-        # Convert RGB to BGR for QImage
-        img_rgb = img.convert('RGB')  # Ensure RGB mode
-        img_array = np.array(img_rgb)
-        qimage = QImage(img_array.data, img_array.shape[1], img_array.shape[0], 
-                        img_array.strides[0], QImage.Format_RGB888)
-        
-        canvas.image = qimage
-        canvas.setMinimumSize(pix.width, pix.height)
+        # Syncing the slider must not feed back into on_zoom_slide, it would clamp the zoom to its range
+        slider = self.pdf_docs[f"{tab_id}_slider"]
+        slider.blockSignals(True)
+        slider.setValue(int(zoom * 100))
+        slider.blockSignals(False)
+        self.pdf_docs[f"{tab_id}_zoom_label"].setText(f"{int(zoom * 100)}%")
+
+    def request_tiles(self, tab_id):
+        canvas = self.pdf_docs.get(f"{tab_id}_canvas")
+        if canvas is None or not canvas.tiled:
+            return
+        path, page_num, zoom, rotation, _, mode = self.render_targets[tab_id]
+        x, y = canvas.image_offset(*canvas.page_size)
+        viewport = self.pdf_docs[f"{tab_id}_scroll"].viewport()
+        visible = device_rect(QRect(-canvas.x() - x, -canvas.y() - y, viewport.width(), viewport.height()), canvas.dpr)
+        visible.adjust(-TILE_MARGIN, -TILE_MARGIN, TILE_MARGIN, TILE_MARGIN)
+        wanted = set()
+        tiles = {}
+        for col, row in visible_tiles(*canvas.raster_size, visible):
+            key = RenderCache.key(path, page_num, zoom, rotation, (col, row), mode)
+            wanted.add(key)
+            tile = canvas.tiles.get((col, row))
+            if tile is None:
+                image = self.render_cache.get(key)
+                tile = QPixmap.fromImage(image) if image is not None else None
+            if tile is not None:
+                tiles[(col, row)] = tile
+            else:
+                self.render_pool.request(key, tab_id, path, page_num, zoom, rotation, (col, row), mode)
+        # Tiles that scrolled away stay in the LRU cache only
+        canvas.tiles = tiles
+        self.render_pool.cancel(tab_id, keep=wanted)
         canvas.update()
 
-        self.notebook.setTabText(self.notebook.indexOf(canvas.parent().parent()),
-                                 f"{os.path.basename(pdf_doc.name)} - Page {page_num+1}/{pdf_doc.page_count}")
+    def show_image(self, tab_id, qimage, key):
+        self.pdf_docs[f"{tab_id}_canvas"].set_image(qimage, key)
 
-        if not self.from_slide:
-            self.pdf_docs[f"{tab_id}_slider"].setValue(int(zoom * 100))
-            self.zoom_label_var.setText(f"{int(zoom * 100)}%")
+    def toggle_continuous(self, tab_id=None):
+        if tab_id is None:
+            tab_id = self.get_tab_id(self.notebook.currentIndex())
+        if tab_id not in self.view_modes:
+            return
+        scroll_area = self.pdf_docs[f"{tab_id}_scroll"]
+        view = self.pdf_docs.get(f"{tab_id}_continuous")
+        if view is None:
+            view = ContinuousView(scroll_area.parentWidget(), tab_id, self, self.pdf_docs[tab_id])
+            layout = scroll_area.parentWidget().layout()
+            layout.insertWidget(layout.indexOf(scroll_area) + 1, view)
+            self.pdf_docs[f"{tab_id}_continuous"] = view
+        self.render_pool.cancel(tab_id)
+        if self.view_modes[tab_id] == "single":
+            self.view_modes[tab_id] = "continuous"
+            scroll_area.hide()
+            view.show()
         else:
-            self.from_slide = False
+            self.view_modes[tab_id] = "single"
+            view.hide()
+            view.pages = {}
+            view.previews = {}
+            scroll_area.show()
+        self.schedule_render(tab_id, force=True)
 
-    def close_tab(self, index=None):
+    def on_thumbnail_rendered(self, key, image):
+        for tab_id in self.view_modes:
+            self.pdf_docs[f"{tab_id}_thumbnails"].on_thumbnail(key, image)
+
+    def on_continuous_scroll(self, tab_id, page_num):
+        if self.current_pages.get(tab_id) != page_num:
+            self.current_pages[tab_id] = page_num
+            self.update_page_controls(tab_id)
+
+    def page_area(self, tab_id):
+        # Widget whose size the fit operations fill
+        if self.view_modes[tab_id] == "continuous":
+            return self.pdf_docs[f"{tab_id}_continuous"].viewport()
+        return self.pdf_docs[f"{tab_id}_canvas"]
+
+    def on_page_rendered(self, key, qimage):
+        self.render_cache.put(key, qimage)
+        for tab_id, target in self.render_targets.items():
+            if self.view_modes[tab_id] == "continuous":
+                self.pdf_docs[f"{tab_id}_continuous"].on_rendered(key, qimage)
+            elif target == key:
+                self.show_image(tab_id, qimage, key)
+            elif key[4] is not None and target[:4] == key[:4] and target[5] == key[5]:
+                canvas = self.pdf_docs[f"{tab_id}_canvas"]
+                if canvas.tiled:
+                    canvas.tiles[key[4]] = QPixmap.fromImage(qimage)
+                    canvas.update()
+
+    def on_render_failed(self, key, message):
+        if key[0] == "open":
+            self.opening.pop(key[1], None)
+            self.show_open_error(key[1], message)
+        elif key[0] == "reopen":
+            self.show_reload_error(key[1], message)
+        elif key[0] == "repair":
+            self.repairs.pop(key)()  # opened without a copy then
+        elif key[0] == "hashes":
+            self.document_watcher.on_hashes_failed(key[1])
+        elif key[0] == "hits":
+            # Kept as a page without links or words; otherwise every mouse move would submit it again
+            self.on_hit_targets(key, ([], []))
+        elif key in self.render_targets.values():
+            QMessageBox.critical(self, "Error", f"Failed to render page {key[1] + 1}: {message}")
+
+    def focus_search(self):
         tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
-            self.pdf_docs[tab_id].close()
-            del self.pdf_docs[tab_id]
-            del self.pdf_docs[f"{tab_id}_canvas"]
-            del self.pdf_docs[f"{tab_id}_overlay"]
-            del self.pdf_docs[f"{tab_id}_slider"]
-            del self.pdf_docs[f"{tab_id}_page_var"]
-            del self.pdf_docs[f"{tab_id}_max_label"]
-            del self.current_pages[tab_id]
-            del self.zoom_levels[tab_id]
+        search_var = self.pdf_docs.get(f"{tab_id}_search_var")
+        if search_var:
+            search_var.setFocus()
+            search_var.selectAll()
+
+    def search(self, tab_id, step=1):
+        query = self.pdf_docs[f"{tab_id}_search_var"].text().strip()
+        if not query:
+            self.search_results.pop(tab_id, None)
+            self.update_search_label(tab_id)
+            self.refresh_view(tab_id)
+            return
+        previous = self.search_results.get(tab_id)
+        if previous and previous[0] == query and previous[1]:
+            # Same query again: move to the next match
+            matches = previous[1]
+            position = (previous[2] + step) % len(matches)
+        else:
+            matches = self.text_indexer.search(self.doc_paths[tab_id], query)
+            current = self.current_pages[tab_id]
+            position = next((i for i, match in enumerate(matches) if match[0] >= current), 0)
+        self.search_results[tab_id] = (query, matches, position)
+        self.update_search_label(tab_id)
+        if matches:
+            self.go_to_page(tab_id, matches[position][0])
+        self.refresh_view(tab_id)
+
+    def on_index_progress(self, path, indexed, page_count):
+        for tab_id, result in list(self.search_results.items()):
+            if os.path.abspath(self.doc_paths[tab_id]) == path:
+                # Pick up matches from the pages indexed meanwhile, without moving the view
+                query, matches, position = result
+                current = matches[position] if matches else None
+                matches = self.text_indexer.search(path, query)
+                position = matches.index(current) if current in matches else 0
+                self.search_results[tab_id] = (query, matches, position)
+                self.refresh_view(tab_id)
+        for tab_id in list(self.view_modes):
+            if os.path.abspath(self.doc_paths[tab_id]) == path:
+                self.update_search_label(tab_id)
+
+    def update_search_label(self, tab_id):
+        label = self.pdf_docs.get(f"{tab_id}_search_label")
+        if label is None:
+            return
+        reason = self.text_indexer.disabled.get(os.path.abspath(self.doc_paths[tab_id]))
+        if reason is not None:
+            label.setText("Search unavailable")
+            label.setToolTip(reason)
+            return
+        indexed, page_count = self.text_indexer.status(self.doc_paths[tab_id])
+        progress = f" (indexing {indexed * 100 // page_count}%)" if indexed < page_count else ""
+        result = self.search_results.get(tab_id)
+        if result is None:
+            label.setText(progress.strip(" ()"))
+        elif result[1]:
+            label.setText(f"{result[2] + 1}/{len(result[1])}{progress}")
+        else:
+            label.setText(f"No matches{progress}")
+
+    def refresh_view(self, tab_id):
+        if self.view_modes[tab_id] == "continuous":
+            self.pdf_docs[f"{tab_id}_continuous"].viewport().update()
+        else:
+            self.pdf_docs[f"{tab_id}_canvas"].update()
+
+    def toggle_perf_overlay(self, visible):
+        profiler.enabled = visible or bool(os.environ.get("PDFREADER_PROFILE"))
+        self.perf_overlay.setVisible(visible)
+        if visible:
+            self.perf_timer.start(PERF_OVERLAY_MS)
+            self.update_perf_overlay()
+        else:
+            self.perf_timer.stop()
+
+    def update_perf_overlay(self):
+        lines = []
+        for label, name in (("frame", "paint"), ("render", "render"), ("convert", "convert"),
+                            ("schedule", "render_page"), ("open", "open"), ("parse", "open_parse"),
+                            ("state", "state_write")):
+            summary = profiler.summary(name)
+            if summary:
+                lines.append(f"{label:9}p50 {summary['p50']:7.1f}  p95 {summary['p95']:7.1f}  max {summary['max']:7.1f} ms")
+            else:
+                lines.append(f"{label:9}-")
+        for label, name in (("frame", "paint"), ("render", "render")):
+            counts = profiler.histogram(name)
+            peak = max(counts)
+            bars = "".join(HISTOGRAM_BARS[count * (len(HISTOGRAM_BARS) - 1) // peak] if peak else " " for count in counts)
+            lines.append(f"{label:9}|{bars}|  {PROFILE_BUCKETS_MS[0]} .. {PROFILE_BUCKETS_MS[-1]}+ ms")
+        scheduler = self.pdf_docs.get(f"{self.get_tab_id(self.notebook.currentIndex())}_scheduler")
+        if scheduler is not None:
+            stats = scheduler.stats()
+            lines.append(f"renders  requested {stats['requested']}  performed {stats['performed']}  "
+                         f"coalesced {stats['dropped']}")
+        stats = self.render_cache.stats()
+        lines.append(f"cache    hits {stats['hit_rate'] * 100:.0f}%  entries {stats['entries']}")
+        lines.append(f"rasters  {stats['bytes'] / 2**20:.1f} / {stats['max_bytes'] / 2**20:.0f} MB")
+        usage = self.memory_governor.usage()
+        rss = f"{usage['process_rss'] / 2**20:.0f} MB" if usage["process_rss"] is not None else "-"
+        lines.append(f"memory   views+cache {usage['rasters'] / 2**20:.1f} / {usage['budget'] / 2**20:.0f} MB  rss {rss}")
+        lines.append(f"docs     open {usage['open_documents']}  unloaded {usage['unloaded_tabs']}")
+        self.perf_overlay.setText("\n".join(lines))
+        self.perf_overlay.adjustSize()
+        self.perf_overlay.move(self.notebook.width() - self.perf_overlay.width() - 20, 36)
+        self.perf_overlay.raise_()
+
+    def set_cache_size(self):
+        size, ok = QInputDialog.getInt(self, "Render Cache Size", "Rendered pages kept in memory (MB)",
+                                       self.render_cache.max_bytes // 2**20, 16, 16384)
+        if ok:
+            self.render_cache.set_max_bytes(size * 2**20)
+            self.store.set("settings", dict(self.store.get("settings", {}), render_cache_mb=size))
+
+    def export_trace(self):
+        if not profiler.events:
+            QMessageBox.information(self, "Export Trace", "Nothing recorded yet. Turn on the performance overlay "
+                                    "or start with PDFREADER_PROFILE=1.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "Trace Files (*.json)")
+        if file_path:
+            profiler.export_trace(file_path)
+
+    def paint_search_hits(self, painter, tab_id, page_num, page_rect, zoom, rotation, x, y):
+        result = self.search_results.get(tab_id)
+        if not result or page_rect is None:
+            return
+        query, matches, position = result
+        for i, (match_page, rects) in enumerate(matches):
+            if match_page != page_num:
+                continue
+            color = QColor(255, 140, 0, 120) if i == position else QColor(255, 230, 0, 90)
+            for rect in rects:
+                painter.fillRect(page_to_pixels(rect, page_rect, zoom, rotation).translated(x, y), color)
+
+    def hit_index(self, tab_id, page_num):
+        # Built once per page in a worker; None until it is ready
+        path = self.doc_paths[tab_id]
+        key = ("hits", path, page_num)
+        index = self.hit_indexes.get(key)
+        if index is not None:
+            self.hit_indexes.move_to_end(key)
+            return index
+        self.render_pool.submit(key, "hits", lambda result: self.on_hit_targets(key, result),
+                                hit_targets_in_worker, path, page_num)
+        return None
+
+    def on_hit_targets(self, key, result):
+        self.hit_indexes[key] = PageHitIndex(*result)
+        while len(self.hit_indexes) > HIT_INDEX_PAGES:
+            self.hit_indexes.popitem(last=False)
+
+    def follow_link(self, tab_id, link):
+        _, kind, target = link
+        if kind == "page":
+            self.go_to_page(tab_id, target)
+        else:
+            QDesktopServices.openUrl(QUrl(target))
+
+    def select_words(self, tab_id, page_num, anchor, end):
+        if self.selections.get(tab_id) != (page_num, anchor, end):
+            self.selections[tab_id] = (page_num, anchor, end)
+            self.pdf_docs[f"{tab_id}_canvas"].update()
+
+    def clear_selection(self, tab_id):
+        if self.selections.pop(tab_id, None) is not None:
+            self.pdf_docs[f"{tab_id}_canvas"].update()
+
+    def copy_selection(self):
+        tab_id = self.get_tab_id(self.notebook.currentIndex())
+        selection = self.selections.get(tab_id)
+        if selection is None:
+            return
+        page_num, anchor, end = selection
+        index = self.hit_index(tab_id, page_num)
+        if index is not None:
+            QApplication.clipboard().setText(index.text(anchor, end))
+
+    def paint_selection(self, painter, tab_id, page_num, page_rect, zoom, rotation, x, y):
+        selection = self.selections.get(tab_id)
+        if not selection or selection[0] != page_num or page_rect is None:
+            return
+        index = self.hit_index(tab_id, page_num)
+        if index is None:
+            return
+        _, anchor, end = selection
+        color = QColor(0, 120, 215, 80)
+        for i in range(min(anchor, end), max(anchor, end) + 1):
+            painter.fillRect(page_to_pixels(index.words[i][0], page_rect, zoom, rotation).translated(x, y), color)
+
+    def closeEvent(self, event):
+        self.save_state()
+        self.store.flush()
+        self.render_pool.shutdown()
+        self.text_indexer.shutdown()
+        super().closeEvent(event)
+
+    def close_tab(self, index=None):
+        if index is None or isinstance(index, bool):  # the menu action passes its checked state
+            index = self.notebook.currentIndex()
+        tab_id = self.get_tab_id(index)
+        if tab_id in self.pending_tabs:
+            if self.opening.pop(tab_id, None):
+                self.render_pool.cancel(("open", tab_id))
+            self.open_errors.pop(tab_id, None)
+            self.hide_tab_message(tab_id)
+            tab_widget = self.pdf_docs.pop(f"{tab_id}_tab")
+            self.pending_tabs.pop(tab_id)
             self.notebook.removeTab(index)
+            tab_widget.deleteLater()  # removeTab leaves the page widget alive
+            self.save_state()
             if self.notebook.count() == 0:
                 self.close()
+        elif tab_id:
+            self.documents[self.doc_paths[tab_id]] = self.tab_state(tab_id)
+            self.release_tab(tab_id)
+            tab_widget = self.pdf_docs.pop(f"{tab_id}_tab")
+            self.memory_governor.forget(tab_id)
+            self.notebook.removeTab(index)
+            tab_widget.deleteLater()
+            self.save_state()
+            if self.notebook.count() == 0:
+                self.close()
+
+    def release_tab(self, tab_id):
+        # Closes the document and drops everything built for it, except the tab widget itself
+        self.pdf_docs.pop(tab_id).close()
+        path = self.doc_paths.pop(tab_id)
+        self.hide_tab_message(tab_id)
+        self.pdf_docs.pop(f"{tab_id}_scheduler").stop()
+        for suffix in ("canvas", "scroll", "thumbnails", "continuous", "overlay", "slider", "page_var",
+                       "max_label", "zoom_label", "search_var", "search_label"):
+            self.pdf_docs.pop(f"{tab_id}_{suffix}", None)
+        del self.current_pages[tab_id]
+        del self.zoom_levels[tab_id]
+        del self.render_modes[tab_id]
+        del self.view_modes[tab_id]
+        del self.page_geometry[tab_id]
+        self.search_results.pop(tab_id, None)
+        self.selections.pop(tab_id, None)
+        self.render_targets.pop(tab_id, None)
+        self.pending_scroll.pop(tab_id, None)
+        self.unrastered.discard(tab_id)
+        self.render_pool.cancel(tab_id)
+        self.render_pool.cancel(f"{tab_id}_thumbs")
+        if not any(self.doc_paths[other] == path for other in self.view_modes):
+            self.text_indexer.release(path)
+            self.render_cache.discard(path)
+            for key in [key for key in self.hit_indexes if key[1] == path]:
+                del self.hit_indexes[key]
+            self.document_watcher.unwatch(path)
+
+    def reload_document(self, path, changed, probed=False):
+        # The file changed on disk: reopen it in every tab showing it, keep page and zoom,
+        # and re-render only the pages whose content changed
+        tabs = [tab_id for tab_id in self.view_modes if self.doc_paths[tab_id] == path]
+        if not tabs:
+            self.stale_pages.pop(path, None)
+            return
+        if changed is None:  # the new version could not be compared
+            changed = range(max(self.pdf_docs[tab_id].page_count for tab_id in tabs))
+        self.stale_pages.setdefault(path, set()).update(changed)
+        if not probed and (("reopen", path) in self.render_pool.pending or ("repair", path) in self.repairs):
+            return  # the version being parsed is already out of date; these pages are reloaded with it
+        new_docs = {}
+        try:
+            size = os.path.getsize(path)
+            if not probed and size > OPEN_INLINE_MAX_BYTES and not os.path.exists(repaired_path(path)):
+                # Parsed in a worker first, as on open; the tabs keep showing the earlier version meanwhile
+                self.render_pool.submit(("reopen", path), ("reopen", path),
+                                        lambda info: self.on_reopen_probed(path, info), probe_in_worker, path)
+                return
+            doc_key = document_key(path)
+            for tab_id in tabs:
+                with profiler.span("open"):
+                    new_docs[tab_id] = open_document(path)
+        except Exception as e:
+            for pdf_doc in new_docs.values():
+                pdf_doc.close()
+            self.show_reload_error(path, str(e))
+            return
+        changed = self.stale_pages.pop(path)
+        for page_num in changed:
+            self.render_cache.discard(path, page_num)
+        for key in [key for key in self.hit_indexes if key[1] == path and key[2] in changed]:
+            del self.hit_indexes[key]
+        self.text_indexer.reload(path, new_docs[tabs[0]].page_count, changed)
+        for tab_id, pdf_doc in new_docs.items():
+            self.hide_tab_message(tab_id)
+            self.pdf_docs[tab_id].close()
+            self.pdf_docs[tab_id] = pdf_doc
+            self.current_pages[tab_id] = min(self.current_pages[tab_id], pdf_doc.page_count - 1)
+            geometry = self.page_geometry[tab_id]
+            for page_num in [page_num for page_num in geometry if page_num in changed]:
+                del geometry[page_num]
+            self.search_results.pop(tab_id, None)
+            if self.selections.get(tab_id, (None,))[0] in changed:
+                del self.selections[tab_id]
+            self.render_pool.cancel(tab_id)
+            self.pdf_docs[f"{tab_id}_thumbnails"].reload(pdf_doc, changed, doc_key)
+            view = self.pdf_docs.get(f"{tab_id}_continuous")
+            if view is not None:
+                view.reload(changed)
+            self.schedule_render(tab_id, force=True)
+            self.update_search_label(tab_id)
+
+    def on_reopen_probed(self, path, info):
+        self.after_repair(("repair", path), path, info, lambda: self.reload_document(path, (), probed=True))
+
+    def show_reload_error(self, path, message):
+        # The earlier version stays on screen; the next change on disk tries again
+        for tab_id in [tab_id for tab_id in self.view_modes if self.doc_paths[tab_id] == path]:
+            self.show_tab_message(tab_id, f"Could not reload {os.path.basename(path)}, "
+                                          f"showing the earlier version:\n{message}")
+
+    def unload_tab(self, tab_id):
+        # The tab goes back to a placeholder; activating it reopens the document where it was
+        state = dict(self.tab_state(tab_id), path=self.doc_paths[tab_id])
+        self.release_tab(tab_id)
+        tab_widget = self.pdf_docs[f"{tab_id}_tab"]
+        for child in tab_widget.findChildren(QWidget, options=Qt.FindDirectChildrenOnly):
+            child.deleteLater()
+        self.pending_tabs[tab_id] = state
+        self.notebook.setTabText(self.notebook.indexOf(tab_widget), os.path.basename(state["path"]))
+
+    def drop_rasters(self, tab_id):
+        # Background tab: keep the document, forget the pixels; they are rendered again on activation
+        if tab_id in self.unrastered:
+            return
+        canvas = self.pdf_docs[f"{tab_id}_canvas"]
+        canvas.set_image(None, None)
+        canvas.tiles = {}
+        view = self.pdf_docs.get(f"{tab_id}_continuous")
+        if view is not None:
+            view.pages = {}
+            view.previews = {}
+        self.render_pool.cancel(tab_id)
+        path = self.doc_paths[tab_id]
+        current = self.get_tab_id(self.notebook.currentIndex())
+        if current not in self.view_modes or self.doc_paths[current] != path:
+            self.render_cache.discard(path)
+        self.unrastered.add(tab_id)
+
+    def prune_caches(self):
+        # On a thread: walking a large thumbnail cache takes a while
+        paths = [state["path"] for state in self.pending_tabs.values()]
+        paths += [self.doc_paths[tab_id] for tab_id in self.view_modes]
+        keep = set()
+        for path in paths:
+            with contextlib.suppress(OSError):
+                keep.add(document_key(path))
+        threading.Thread(target=lambda: [prune_cache_dir(directory, limit, keep)
+                                         for directory, limit in CACHE_LIMITS.items()], daemon=True).start()
 
     def prev_page(self):
         index = self.notebook.currentIndex()
         if index == -1:
             return
         tab_id = self.get_tab_id(index)
-        if tab_id:
+        if tab_id in self.view_modes:
             current_page = self.current_pages[tab_id]
             if current_page > 0:
                 self.go_to_page(tab_id, current_page - 1)  # go_to_page fonksiyonunu çağır
@@ -412,7 +3185,7 @@ class PDFReader(QMainWindow):
         if index == -1:
             return
         tab_id = self.get_tab_id(index)
-        if tab_id:
+        if tab_id in self.view_modes:
             current_page = self.current_pages[tab_id]
             if current_page < self.pdf_docs[tab_id].page_count - 1:
                 self.go_to_page(tab_id, current_page + 1)  # go_to_page fonksiyonunu çağır
@@ -428,8 +3201,7 @@ class PDFReader(QMainWindow):
 
         if 0 <= page_num < self.pdf_docs[tab_id].page_count:
             self.current_pages[tab_id] = page_num
-            self.pdf_docs[f"{tab_id}_page_var"].setText(str(page_num + 1))  # Sayfa numarasını güncelle
-            self.render_page(tab_id)
+            self.schedule_render(tab_id)
             self.save_state()
         else:
             QMessageBox.critical(self, "Error", "Invalid page number")
@@ -446,34 +3218,45 @@ class PDFReader(QMainWindow):
     def zoom_in(self, tab_id=None):
         if tab_id is None:
             tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
+        if tab_id in self.view_modes:
             self.zoom_levels[tab_id] *= 1.2
-            self.render_page(tab_id)
+            self.schedule_render(tab_id)
 
     def zoom_out(self, tab_id=None):
         if tab_id is None:
             tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
+        if tab_id in self.view_modes:
             self.zoom_levels[tab_id] /= 1.2
             if self.zoom_levels[tab_id] < 0.1:
                 self.zoom_levels[tab_id] = 0.1
-            self.render_page(tab_id)
+            self.schedule_render(tab_id)
 
     def switch_tab(self):
         current_index = self.notebook.currentIndex()
         next_index = (current_index + 1) % self.notebook.count()
         self.notebook.setCurrentIndex(next_index)
 
+    def migrate_legacy_state(self):
+        for key, name in LEGACY_STATE_FILES.items():
+            if self.store.get(key) is not None or not os.path.isfile(name):
+                continue
+            try:
+                with open(name, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if key == "recent_files":
+                value = [path for path in value if isinstance(path, str)] if isinstance(value, list) else None
+            elif not isinstance(value, dict) or "tabs" not in value:
+                value = None  # the oldest format is keyed by tab ids of a past run, nothing to restore from it
+            if value is not None:
+                self.store.set(key, value)
+
     def load_recent_files(self):
-        try:
-            with open("recent_files.json", "r") as f:
-                self.recent_files = json.load(f)
-        except FileNotFoundError:
-            self.recent_files = []
+        self.recent_files = list(self.store.get("recent_files", []))
 
     def save_recent_files(self):
-        with open("recent_files.json", "w") as f:
-            json.dump(self.recent_files, f)
+        self.store.set("recent_files", list(self.recent_files))
 
     def update_recent_menu(self):
         self.recent_menu.clear()  # Eski öğeleri temizle
@@ -483,22 +3266,64 @@ class PDFReader(QMainWindow):
             action.triggered.connect(lambda checked, fp=file_path: self.add_pdf_tab(fp))
             self.recent_menu.addAction(action)
 
-    def save_state(self):
-        state = {
-            "current_pages": self.current_pages,
-            "zoom_levels": self.zoom_levels
+    def tab_state(self, tab_id):
+        if tab_id in self.pending_tabs:
+            return {key: value for key, value in self.pending_tabs[tab_id].items() if key != "path"}
+        horizontal, vertical = self.scroll_bars(tab_id)
+        return {
+            "page": self.current_pages[tab_id],
+            "zoom": self.zoom_levels[tab_id],
+            "view_mode": self.view_modes[tab_id],
+            "render_mode": self.render_modes[tab_id],
+            "scroll": [horizontal.value(), vertical.value()],
         }
-        with open("state.json", "w") as f:
-            json.dump(state, f)
+
+    def save_state(self):
+        # Keyed by absolute path; tab ids are only valid for one run
+        tabs = []
+        for index in range(self.notebook.count()):
+            tab_id = self.get_tab_id(index)
+            path = self.pending_tabs[tab_id]["path"] if tab_id in self.pending_tabs else self.doc_paths[tab_id]
+            tab_state = self.tab_state(tab_id)
+            self.documents.pop(path, None)
+            self.documents[path] = tab_state  # most recently seen last
+            tabs.append(dict(tab_state, path=path))
+        while len(self.documents) > MAX_REMEMBERED_DOCUMENTS:
+            del self.documents[next(iter(self.documents))]
+        self.store.set("state", {
+            "tabs": tabs,
+            "active": self.notebook.currentIndex(),
+            "documents": self.documents,
+        })
 
     def load_state(self):
-        try:
-            with open("state.json", "r") as f:
-                state = json.load(f)
-                self.current_pages.update(state.get("current_pages", {}))
-                self.zoom_levels.update(state.get("zoom_levels", {}))
-        except FileNotFoundError:
-            pass
+        state = self.store.get("state", {})
+        self.documents.update(state.get("documents", {}))
+        tabs = [tab for tab in state.get("tabs", []) if os.path.exists(tab["path"])]
+        if not tabs:
+            return
+        # Only placeholders are created here; switching to a tab opens its document
+        self.restoring = True
+        for tab in tabs:
+            self.add_pdf_tab(tab["path"], tab, activate=False)
+        active = state.get("active", 0)
+        # Still restoring: open_startup loads the active tab once the window is shown
+        self.notebook.setCurrentIndex(active if 0 <= active < len(tabs) else 0)
+        self.restoring = False
+
+    def startup_finished(self):
+        if "first_page" in startup_marks:
+            return
+        startup_mark("first_page")
+        print(json.dumps(startup_marks), flush=True)
+        QTimer.singleShot(0, self.close)
+
+    def batch_export(self):
+        tab_id = self.get_tab_id(self.notebook.currentIndex())
+        paths = [self.doc_paths[tab_id]] if tab_id in self.view_modes else []
+        dialog = ExportDialog(self, paths)
+        dialog.exec_()
+        dialog.exporter.cancel()
 
     def open_pdf(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open PDF", "", "PDF Files (*.pdf)")
@@ -508,49 +3333,131 @@ class PDFReader(QMainWindow):
     def fit_width(self, tab_id=None):
         if tab_id is None:
             tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
-            canvas = self.pdf_docs.get(f"{tab_id}_canvas")
-            page = self.pdf_docs[tab_id].load_page(self.current_pages.get(tab_id, 0))
-            page_width = page.rect.width
+        if tab_id in self.view_modes:
+            canvas = self.page_area(tab_id)
+            page_rect = self.page_rect(tab_id, self.current_pages.get(tab_id, 0))
+            page_width = page_rect.width
             canvas_width = canvas.width()
             if canvas_width > 0:
                 self.zoom_levels[tab_id] = canvas_width / page_width
-                self.render_page(tab_id)
+                self.schedule_render(tab_id)
 
     def fit_height(self, tab_id=None):
         if tab_id is None:
             tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
-            canvas = self.pdf_docs.get(f"{tab_id}_canvas")
-            page = self.pdf_docs[tab_id].load_page(self.current_pages.get(tab_id, 0))
-            page_height = page.rect.height
+        if tab_id in self.view_modes:
+            canvas = self.page_area(tab_id)
+            page_rect = self.page_rect(tab_id, self.current_pages.get(tab_id, 0))
+            page_height = page_rect.height
             canvas_height = canvas.height()
             if canvas_height > 0:
                 self.zoom_levels[tab_id] = canvas_height / page_height
-                self.render_page(tab_id)
+                self.schedule_render(tab_id)
 
     def zoom_reset(self, tab_id=None):
         if tab_id is None:
             tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
+        if tab_id in self.view_modes:
             self.zoom_levels[tab_id] = 1.0
-            self.render_page(tab_id)
+            self.schedule_render(tab_id)
 
     def on_zoom_slide(self, value, tab_id):
-        self.from_slide = True
         self.zoom_levels[tab_id] = value / 100
-        self.render_page(tab_id)
+        self.schedule_render(tab_id)
 
     def setup_zoom_rectangle(self, tab_id=None):
         if tab_id is None:
             tab_id = self.get_tab_id(self.notebook.currentIndex())
-        if tab_id:
+        if tab_id in self.view_modes:
             self.zoom_mode = 'rectangle'
             QMessageBox.information(self, "Area Zoom", "Drag a rectangle to zoom to that area")
 
+def export_main(argv):
+    parser = argparse.ArgumentParser(prog="PDFReader --export", description="Render PDF pages to image files")
+    parser.add_argument("--export", metavar="OUT_DIR", required=True, help="folder for the page images")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--pages", default="all", help='"all" or 1-based pages: "1-10,20,30-", "last", "-3"')
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--colorspace", choices=EXPORT_COLORSPACES, default="rgb")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="png")
+    parser.add_argument("--quality", type=int, default=EXPORT_JPEG_QUALITY, help="JPEG quality")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    args = parser.parse_args(argv)
+    try:
+        parse_page_ranges(args.pages, 0)
+    except ValueError as e:
+        parser.error(f"--pages: {e}")
+
+    start = time.perf_counter()
+    manifests = {}
+    failed = {}
+    written = 0
+    total = 0
+    executor = worker_pool(max(1, args.workers))
+    # future -> (path, document out dir, worker function); chunks are queued once a file's pages are counted
+    futures = {executor.submit(export_pages_in_worker, path, args.pages): (path, doc_dir, export_pages_in_worker)
+               for path, doc_dir in zip(args.files, export_dirs(args.files, args.export))}
+    try:
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, doc_dir, fn = futures.pop(future)
+                if future.cancelled() or path in failed:
+                    continue
+                try:
+                    if fn is export_pages_in_worker:
+                        pages = future.result()
+                        total += len(pages)
+                        manifests[doc_dir] = []
+                        for job in export_jobs(path, pages, doc_dir):
+                            futures[executor.submit(export_in_worker, *job, args.dpi, args.colorspace,
+                                                    args.format, args.quality)] = (path, doc_dir, export_in_worker)
+                    else:
+                        _, entries = future.result()
+                        manifests[doc_dir].extend(entries)
+                        written += len(entries)
+                except Exception as e:  # BrokenProcessPool too; the other files go on
+                    failed[path] = str(e) or type(e).__name__
+                    print(f"\n{path}: {failed[path]}", file=sys.stderr)
+                    for other, (other_path, _, _) in futures.items():
+                        if other_path == path:
+                            other.cancel()
+                    continue
+                print(f"\rexported {written}/{total} pages", end="", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"\ncancelled after {written}/{total} pages", file=sys.stderr)
+        return 130
+    executor.shutdown()
+    if args.format == "raw":
+        for doc_dir, entries in manifests.items():
+            if entries:
+                write_export_manifest(doc_dir, entries, args.dpi, args.colorspace)
+    elapsed = time.perf_counter() - start
+    print(f"\n{written} pages in {elapsed:.1f} s ({written / elapsed if elapsed else 0:.1f} pages/s)", file=sys.stderr)
+    if failed:
+        print(f"{len(failed)} of {len(args.files)} files failed:\n{export_failure_text(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
 if __name__ == "__main__":
+    if "--export" in sys.argv[1:]:
+        sys.exit(export_main(sys.argv[1:]))
+    startup_mark("imported")
     app = QApplication(sys.argv)
+    args = app.arguments()[1:]  # without the options Qt consumed
+    files = [os.path.abspath(arg) for arg in args if arg != "--new-instance"]
+    server = None
+    if "--new-instance" not in args:
+        if forward_to_instance(files):
+            sys.exit(0)
+        server = InstanceServer()
+        if not server.listen(files):
+            sys.exit(0)  # another instance started at the same moment and took the files
     app.setFont(QFont("Segoe UI Symbol", 10))
-    window = PDFReader()
+    window = PDFReader(files)
+    if server is not None:
+        server.files_received.connect(window.open_forwarded)
     window.show()
+    startup_mark("window_shown")
     sys.exit(app.exec_())
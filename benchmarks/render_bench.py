@@ -0,0 +1,204 @@
+"""Headless render benchmark over a directory of PDFs, with JSON output.
+
+Calls the reader's own render functions for a page (display list and
+raster as in a worker, QImage as on the GUI side) without opening a window,
+and splits the time into load_page, rasterize and image conversion. Opening
+each document (xref parse or repair, page count) is timed separately as
+open_ms. A document that fails is recorded with its error and skipped.
+
+    python benchmarks/render_bench.py docs/ --zoom 1 1.5 2 --pages 1-10,last --json out.json
+    python benchmarks/render_bench.py scans/ --mode mono --dpr 2
+    python benchmarks/render_bench.py docs/ --compare baseline.json --max-regression 0.2
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("load_page", "rasterize", "convert")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("pdfreader", os.path.join(ROOT, "__init__.pyw.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(timings, elapsed):
+    latency = [sum(t[stage] for stage in STAGES) * 1000 for t in timings]
+    summary = {
+        "renders": len(timings),
+        "seconds": elapsed,
+        "pages_per_sec": len(timings) / elapsed if elapsed else None,
+        "latency_ms": {
+            "mean": sum(latency) / len(latency) if latency else None,
+            "p50": percentile(latency, 0.50),
+            "p95": percentile(latency, 0.95),
+            "p99": percentile(latency, 0.99),
+            "max": max(latency) if latency else None,
+        },
+        "stages_ms": {stage: sum(t[stage] for t in timings) * 1000 for stage in STAGES},
+    }
+    return summary
+
+
+def render_document(app, path, zooms, pattern, rotation, repeat, mode, dpr):
+    start = time.perf_counter()
+    page_count = app.worker_document(path).page_count
+    open_time = time.perf_counter() - start
+    timings = []
+    try:
+        for page_num in app.parse_page_ranges(pattern, page_count):
+            # Parsed once per page, like the worker display list cache; zoom changes only rasterize
+            start = time.perf_counter()
+            display_list = app.worker_display_list(path, page_num)
+            load_time = time.perf_counter() - start
+            for _ in range(repeat):
+                for zoom in zooms:
+                    start = time.perf_counter()
+                    result = app.rasterize(display_list, zoom * dpr, rotation, None, mode)
+                    rasterized = time.perf_counter()
+                    qimage = app.samples_to_qimage(*result)
+                    converted = time.perf_counter()
+                    timings.append({
+                        "page": page_num, "zoom": zoom,
+                        "load_page": load_time, "rasterize": rasterized - start, "convert": converted - rasterized,
+                    })
+                    load_time = 0.0
+                    del result, qimage
+            del display_list
+    finally:
+        app.worker_forget(path)
+    return open_time, timings
+
+
+def find_documents(paths):
+    documents = []
+    for path in paths:
+        if os.path.isdir(path):
+            documents.extend(sorted(glob.glob(os.path.join(path, "**", "*.pdf"), recursive=True)))
+        else:
+            documents.append(path)
+    return documents
+
+
+def compare(result, baseline_path, max_regression):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["summary"]
+    current = result["summary"]
+    failures = []
+    for name in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"][name], current["latency_ms"][name]
+        if old and new and new > old * (1 + max_regression):
+            failures.append(f"{name} latency {old:.2f} -> {new:.2f} ms")
+    old, new = baseline["pages_per_sec"], current["pages_per_sec"]
+    if old and new and new < old / (1 + max_regression):
+        failures.append(f"pages/sec {old:.1f} -> {new:.1f}")
+    old, new = baseline.get("open_ms", {}).get("max"), current["open_ms"]["max"]
+    if old and new and new > old * (1 + max_regression):
+        failures.append(f"max open {old:.2f} -> {new:.2f} ms")
+    return failures
+
+
+def main():
+    app = load_app()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="PDF files or directories searched recursively")
+    parser.add_argument("--zoom", type=float, nargs="+", default=[1.0, 1.5, 2.0])
+    parser.add_argument("--pages", default="1-10", help='"all" or 1-based pages: "1-10,20,30-", "last", "-3"')
+    parser.add_argument("--rotation", type=int, default=0, choices=(0, 90, 180, 270))
+    parser.add_argument("--mode", default="color", choices=list(app.RENDER_MODES), help="render mode of the reader")
+    parser.add_argument("--dpr", type=float, default=1.0, help="device pixel ratio; rasters are zoom x dpr")
+    parser.add_argument("--repeat", type=int, default=1, help="render every page and zoom this many times")
+    parser.add_argument("--json", help="write the results here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run; exit 1 on a regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed slowdown as a fraction")
+    args = parser.parse_args()
+
+    documents = find_documents(args.paths)
+    if not documents:
+        parser.error("no PDF files found")
+    app.fitz.TOOLS  # the lazy import would otherwise be timed as the first document's open
+    baseline_rss = peak_rss_mb()
+    all_timings = []
+    per_document = []
+    start = time.perf_counter()
+    for path in documents:
+        document_start = time.perf_counter()
+        try:
+            open_time, timings = render_document(app, path, args.zoom, args.pages, args.rotation, args.repeat,
+                                                 args.mode, args.dpr)
+        except Exception as e:  # an unreadable file is one result, not the end of the run
+            per_document.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+            print(f"{os.path.basename(path):30} failed: {per_document[-1]['error']}", file=sys.stderr)
+            continue
+        per_document.append(dict(summarize(timings, time.perf_counter() - document_start),
+                                 path=path, open_ms=open_time * 1000))
+        all_timings.extend(timings)
+        print(f"{os.path.basename(path):30} renders={len(timings):5d}  "
+              f"open={open_time * 1000:8.2f} ms  p95={per_document[-1]['latency_ms']['p95'] or 0:8.2f} ms",
+              file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    open_ms = [document["open_ms"] for document in per_document if "open_ms" in document]
+
+    result = {
+        "environment": {
+            "python": platform.python_version(),
+            "pymupdf": app.fitz.VersionBind,
+            "mupdf": app.fitz.VersionFitz,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "zoom": args.zoom, "pages": args.pages, "rotation": args.rotation, "repeat": args.repeat,
+            "mode": args.mode, "dpr": args.dpr,
+        },
+        "summary": dict(summarize(all_timings, elapsed),
+                        open_ms={"total": sum(open_ms), "p50": percentile(open_ms, 0.50),
+                                 "max": max(open_ms, default=None)},
+                        failed=sum(1 for document in per_document if "error" in document),
+                        peak_rss_mb=peak, peak_rss_delta_mb=None if peak is None else peak - baseline_rss),
+        "documents": per_document,
+    }
+    text = json.dumps(result, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        failures = compare(result, args.compare, args.max_regression)
+        for failure in failures:
+            print(f"regression: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
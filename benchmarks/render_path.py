@@ -0,0 +1,90 @@
+"""Compare the old PNG round-trip render path with the direct pixmap path.
+
+Each path runs in its own process so the peak RSS numbers do not mix.
+The old path needs Pillow, which the app itself no longer uses.
+
+    python benchmarks/render_path.py manual.pdf --zoom 1.5 2.0 --pages 20
+"""
+import argparse
+import concurrent.futures
+import importlib.util
+import io
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("pdfreader", os.path.join(ROOT, "__init__.pyw.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def png_roundtrip_to_qimage(pix):
+    # The render path as it was before pixmap_to_qimage
+    import numpy as np
+    from PIL import Image
+    from PyQt5.QtGui import QImage
+    img = Image.open(io.BytesIO(pix.tobytes()))
+    img_array = np.array(img.convert('RGB'))
+    qimage = QImage(img_array.data, img_array.shape[1], img_array.shape[0],
+                    img_array.strides[0], QImage.Format_RGB888)
+    qimage.array = img_array
+    return qimage
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_path(name, pdf_path, zooms, pages):
+    app = load_app()
+    convert = app.pixmap_to_qimage if name == "direct" else png_roundtrip_to_qimage
+    doc = app.fitz.open(pdf_path)
+    page_count = min(pages, doc.page_count)
+    baseline = peak_rss_mb()
+    timings = []
+    for zoom in zooms:
+        matrix = app.fitz.Matrix(zoom, zoom)
+        for page_num in range(page_count):
+            start = time.perf_counter()
+            pix = doc.load_page(page_num).get_pixmap(matrix=matrix)
+            qimage = convert(pix)
+            timings.append(time.perf_counter() - start)
+            del pix, qimage
+    peak = peak_rss_mb()
+    return timings, None if peak is None else peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--zoom", type=float, nargs="+", default=[1.0, 1.5, 2.0])
+    parser.add_argument("--pages", type=int, default=10, help="render the first N pages")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    for name in ("png_roundtrip", "direct"):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            timings, peak = pool.submit(run_path, name, args.pdf, args.zoom, args.pages).result()
+        ms = sorted(t * 1000 for t in timings)
+        print(f"{name:14} renders={len(ms):4d}  mean={statistics.mean(ms):8.2f} ms  "
+              f"p50={ms[len(ms) // 2]:8.2f} ms  max={ms[-1]:8.2f} ms  "
+              f"peak_rss_delta={'n/a' if peak is None else f'{peak:.1f} MB'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Cold-start time of the reader launched with a file argument.
+
+Every run is a fresh process with an empty config dir, so no session is
+restored. The app reports when its module finished importing, when the
+window was shown, when the document was opened and when the first page was
+painted, all in ms since launch, and then quits.
+
+    python benchmarks/startup.py manual.pdf --runs 10 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKS = ("imported", "window_shown", "document_opened", "first_page")
+
+
+def launch(pdf_path, offscreen, timeout):
+    with tempfile.TemporaryDirectory() as config_dir:
+        env = dict(os.environ, XDG_CONFIG_HOME=config_dir, APPDATA=config_dir)
+        if offscreen:
+            env["QT_QPA_PLATFORM"] = "offscreen"
+        env["PDFREADER_STARTUP_BENCHMARK"] = repr(time.time())
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, os.path.join(ROOT, "__init__.pyw.py"), "--new-instance", pdf_path],
+                                env=env, capture_output=True, text=True, timeout=timeout)
+        exited = (time.perf_counter() - start) * 1000
+    for line in result.stdout.splitlines():
+        if line.startswith("{"):
+            return dict(json.loads(line), exited=exited)
+    raise RuntimeError(f"no startup report (exit code {result.returncode}):\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--offscreen", action="store_true", help="use Qt's offscreen platform, for CI")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    runs = [launch(os.path.abspath(args.pdf), args.offscreen, args.timeout) for _ in range(args.runs)]
+    summary = {}
+    for mark in MARKS + ("exited",):
+        values = sorted(run[mark] for run in runs if mark in run)
+        if values:
+            summary[mark] = {"median": statistics.median(values), "min": values[0], "max": values[-1]}
+            print(f"{mark:16} median={summary[mark]['median']:8.1f} ms  "
+                  f"min={values[0]:8.1f} ms  max={values[-1]:8.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pdf": args.pdf, "runs": runs, "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()